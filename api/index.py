@@ -1,9 +1,22 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from pymongo import MongoClient
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
+from flask import has_request_context
+from pymongo import MongoClient, ReturnDocument, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import secrets
 import smtplib
+import threading
+import time
+import atexit
+import json
+import click
+import gzip
+import hashlib
+import io
+import glob
+import sys
+from email.utils import format_datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import markdown
@@ -15,6 +28,11 @@ import xml.etree.ElementTree as ET
 import html
 import re
 
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.bccache import Bucket
+from jinja2.ext import Extension
+import tempfile
+
 from dotenv import load_dotenv
 import os
 
@@ -36,6 +54,9 @@ books_collection = db['books']
 books_sync_collection = db['books_sync']
 films_collection = db['films']
 films_sync_collection = db['films_sync']
+mail_outbox_collection = db['mail_outbox']
+meta_collection = db['meta']
+feeds_collection = db['feeds']
 
 # Admin password
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD')
@@ -45,6 +66,106 @@ SMTP_SERVER = os.getenv('SMTP_SERVER')
 SMTP_PORT = os.getenv('SMTP_PORT')
 SMTP_EMAIL = os.getenv('SMTP_EMAIL')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() != 'false'
+SMTP_IDLE_TIMEOUT = 60  # seconds before the pooled connection is closed
+
+# Mail outbox worker
+OUTBOX_POLL_INTERVAL = 5  # seconds
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF_BASE = 2  # seconds, doubled on each retry
+OUTBOX_CLAIM_TIMEOUT = 120  # seconds before a stuck 'sending' message is retried
+OUTBOX_CRON_DRAIN_LIMIT = 20  # messages per hit of /tasks/outbox
+CRON_SECRET = os.getenv('CRON_SECRET')  # bearer token the scheduler sends to /tasks/outbox
+
+_smtp_connection = None
+_smtp_last_used = 0.0
+_smtp_lock = threading.Lock()
+_outbox_wakeup = threading.Event()
+_outbox_thread = None
+_outbox_thread_lock = threading.Lock()
+
+# Bulk import/export
+BULK_BATCH_SIZE = 1000
+RENDER_CHUNK_SIZE = 50  # posts per process pool task when rendering imported markdown
+
+# Films and books archives
+ARCHIVE_PAGE_SIZE = 24
+ARCHIVE_FIRST_YEAR = 1900  # /films/<year> and /books/<year> outside this..next year are 404s
+LITERAL_PAGE_LIMIT = 50  # books per status fetched from Literal.club
+
+# Admin dashboard
+ADMIN_PAGE_SIZE = 25
+ADMIN_POST_PROJECTION = {'title': 1, 'tagline': 1, 'category_id': 1, 'visible': 1, 'created_at': 1}
+POST_COUNTS_INDEX = [('category_id', 1), ('visible', 1)]
+
+# Feed and sitemap
+# Canonical origin for absolute links, e.g. https://example.com. Links in
+# the shared feeds must not come from the request's Host header.
+SITE_URL = os.getenv('SITE_URL', '').rstrip('/')
+FEED_POST_LIMIT = 20
+CONTENT_VERSION_TTL = 60  # seconds between content version checks per instance
+CONTENT_VERSION_TTL_WATCHED = 600  # only while the change stream heartbeat is fresh
+
+_content_version = {'version': None, 'categories_version': None, 'updated_at': None, 'checked_at': 0.0}
+_feed_cache = {}
+_post_counts = {'version': None, 'by_category': None}  # dashboard counts per content version
+
+# Cross-instance cache invalidation
+INVALIDATION_COLLECTIONS = ['posts', 'categories', 'meta']
+INVALIDATION_POLL_INTERVAL = 5  # seconds, when change streams are unavailable
+INVALIDATION_RETRY_DELAY = 5  # seconds before reopening a failed change stream
+CHANGE_STREAMS_UNSUPPORTED = 40573  # not a replica set / sharded cluster
+CHANGE_STREAM_HISTORY_LOST = 286
+CHANGE_STREAM_AWAIT_MS = 5000  # getMore wait; each return is a heartbeat
+CHANGE_STREAM_HEARTBEAT_TIMEOUT = 15  # seconds without one before the stream is not trusted
+
+_instance_initialized = False
+_invalidation = {'mode': None, 'heartbeat_at': 0.0}  # mode: 'change_stream', 'polling' or None
+_invalidation_thread = None
+_invalidation_thread_lock = threading.Lock()
+
+# View counters and popular posts
+# Views are buffered per instance and written behind. A serverless instance
+# that is frozen and then reclaimed (or killed) never runs its flush or the
+# atexit hook, so up to VIEW_FLUSH_INTERVAL seconds / VIEW_FLUSH_EVENTS views
+# per instance can be lost. Counts only rank popular posts, so that is accepted.
+VIEW_FLUSH_INTERVAL = 10  # seconds between batched flushes
+VIEW_FLUSH_EVENTS = 500  # flush early after this many buffered views
+POPULAR_REFRESH_INTERVAL = 300  # seconds
+POPULAR_POSTS_LIMIT = 5
+
+_view_counts = {}
+_view_events = 0
+_view_lock = threading.Lock()
+_view_flush_wakeup = threading.Event()
+_view_thread = None
+_view_thread_lock = threading.Lock()
+_popular_posts = {'posts': None, 'refreshed_at': 0.0}
+
+# Template caching
+# Bytecode from 'flask compile-templates' is read from JINJA_BYTECODE_DIR when
+# it was uploaded with the deploy; otherwise templates compile into /tmp, which
+# starts empty on every cold start
+JINJA_BYTECODE_DIR = os.path.join(app.root_path, 'jinja_bytecode')
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'blog-jinja-cache'))
+FRAGMENT_CACHE_SIZE = 256
+
+# Self-hosted fonts
+GOOGLE_FONTS_CSS_URL = "https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@400;700&family=IBM+Plex+Mono:wght@500"
+FONTS_SOURCE_DIR = os.path.join(os.path.dirname(app.root_path), 'fonts')  # vendored/downloaded TTFs
+FONTS_OUTPUT_DIR = os.path.join(app.static_folder, 'fonts')
+FONTS_MANIFEST = os.path.join(FONTS_OUTPUT_DIR, 'manifest.json')
+FONT_FACES = [
+    # family, weight, source file, preload
+    ('Space Grotesk', 400, 'SpaceGrotesk-Regular.ttf', True),
+    ('Space Grotesk', 700, 'SpaceGrotesk-Bold.ttf', True),
+    ('IBM Plex Mono', 500, 'IBMPlexMono-Medium.ttf', False)
+]
+# Latin-1 plus typographic punctuation; glyphs found in the templates are added at build time
+FONT_BASE_GLYPHS = ''.join(chr(c) for c in range(0x20, 0x7f)) + ''.join(chr(c) for c in range(0xa0, 0x100)) + '‘’“”–—…•·→←'
+FONT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_font_assets = {'loaded': False, 'manifest': None}
 
 LITERAL_API_URL = "https://literal.club/graphql/"
 LITERAL_HANDLE = "epiphany"
@@ -116,6 +237,92 @@ query readingStatesByProfile($limit: Int!, $offset: Int!, $profileId: String!) {
 LETTERBOXD_USERNAME = "prettyboiiii"
 LETTERBOXD_RSS_URL = f"https://letterboxd.com/{LETTERBOXD_USERNAME}/rss/"
 
+class FragmentCacheExtension(Extension):
+    """Jinja tag caching rendered fragments in process:
+
+        {% cache 'nav', current_page, categories_version() %}...{% endcache %}
+
+    All arguments are joined into the cache key, so a fragment is re-rendered
+    whenever any of them changes. Setting ``env.fragment_cache = None``
+    disables caching.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={})
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', [nodes.List(args)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+
+        key = '|'.join(str(part) for part in key_parts)
+        rv = cache.get(key)
+        if rv is None:
+            rv = caller()
+            if len(cache) >= FRAGMENT_CACHE_SIZE:
+                # Drop the oldest entry; dicts keep insertion order
+                cache.pop(next(iter(cache), None), None)
+            cache[key] = rv
+        return rv
+
+# Compiled templates look extensions up by identifier, which otherwise
+# defaults to the module path and so depends on how the app was imported
+FragmentCacheExtension.identifier = 'blog.FragmentCacheExtension'
+
+class ShippedBytecodeCache(FileSystemBytecodeCache):
+    """Read precompiled bytecode from the deployed bundle, write misses to a scratch dir.
+
+    The bundle is read-only on serverless hosts, so templates missing from it
+    (or changed since it was compiled) are cached in fallback_dir instead.
+    """
+
+    def __init__(self, shipped_dir, fallback_dir):
+        super().__init__(shipped_dir)
+        self.fallback = FileSystemBytecodeCache(fallback_dir)
+
+    def get_bucket(self, environment, name, filename, source):
+        # Bytecode depends on the loaded extensions, not only the source, so
+        # an environment with different extensions must not reuse it
+        extensions = ','.join(sorted(environment.extensions))
+        key = self.get_cache_key(f"{name}|{extensions}", filename)
+        bucket = Bucket(environment, key, self.get_source_checksum(source))
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            try:
+                self.fallback.load_bytecode(bucket)
+            except OSError:
+                pass
+
+    def dump_bytecode(self, bucket):
+        # Caching is best effort; a missing or read-only directory must not fail the render
+        try:
+            os.makedirs(self.fallback.directory, exist_ok=True)
+            self.fallback.dump_bytecode(bucket)
+        except OSError as e:
+            print(f"Error writing template bytecode: {e}")
+
+# Must be set before app.jinja_env is first accessed
+app.jinja_options = {
+    **app.jinja_options,
+    'bytecode_cache': ShippedBytecodeCache(JINJA_BYTECODE_DIR, JINJA_CACHE_DIR),
+    'extensions': [FragmentCacheExtension]
+}
+
 def sync_literal_books():
     """Fetch and sync Literal.club books to MongoDB."""
     try:
@@ -140,6 +347,7 @@ def sync_literal_books():
                     'rating': state.get('rating'),
                     'review': state.get('review'),
                     'completed_date': format_date(state.get('completedAt')),
+                    'completed_on': parse_iso_date(state.get('completedAt')),
                     'status': state.get('status')
                 }
         
@@ -154,6 +362,8 @@ def sync_literal_books():
             book['rating'] = metadata.get('rating')
             book['review'] = metadata.get('review')
             book['completed_date'] = metadata.get('completed_date')
+            book['completed_on'] = metadata.get('completed_on')
+            book['year'] = book['completed_on'].year if book['completed_on'] else None
             book['reading_status'] = 'currently_reading'
             book['synced_at'] = datetime.utcnow()
         
@@ -162,6 +372,8 @@ def sync_literal_books():
             book['rating'] = metadata.get('rating')
             book['review'] = metadata.get('review')
             book['completed_date'] = metadata.get('completed_date')
+            book['completed_on'] = metadata.get('completed_on')
+            book['year'] = book['completed_on'].year if book['completed_on'] else None
             book['reading_status'] = 'finished'
             book['synced_at'] = datetime.utcnow()
         
@@ -170,22 +382,34 @@ def sync_literal_books():
             book['rating'] = metadata.get('rating')
             book['review'] = metadata.get('review')
             book['completed_date'] = metadata.get('completed_date')
+            book['completed_on'] = metadata.get('completed_on')
+            book['year'] = book['completed_on'].year if book['completed_on'] else None
             book['reading_status'] = 'want_to_read'
             book['synced_at'] = datetime.utcnow()
         
         # Combine all books
         all_books = currently_reading + finished + want_to_read
         
-        # Clear old data and insert new data
+        # Upsert by Literal book id so older finished books are kept
         if all_books:
-            books_collection.delete_many({})
-            books_collection.insert_many(all_books)
+            books_collection.bulk_write(
+                [UpdateOne({'id': book['id']}, {'$set': book}, upsert=True) for book in all_books],
+                ordered=False
+            )
+            
+            # Books dropped from a complete (non-truncated) shelf lose that status
+            for status, shelf in (('currently_reading', currently_reading), ('want_to_read', want_to_read)):
+                if shelf and len(shelf) < LITERAL_PAGE_LIMIT:
+                    books_collection.update_many(
+                        {'reading_status': status, 'id': {'$nin': [book['id'] for book in shelf]}},
+                        {'$set': {'reading_status': None}}
+                    )
             
             # Update sync timestamp
             books_sync_collection.delete_many({})
             books_sync_collection.insert_one({
                 'last_synced': datetime.utcnow(),
-                'book_count': len(all_books),
+                'book_count': books_collection.estimated_document_count(),
                 'currently_reading_count': len(currently_reading),
                 'finished_count': len(finished),
                 'want_to_read_count': len(want_to_read)
@@ -239,7 +463,7 @@ def fetch_books_by_status(profile_id, status):
             json={
                 "query": BOOKS_QUERY,
                 "variables": {
-                    "limit": 50,
+                    "limit": LITERAL_PAGE_LIMIT,
                     "offset": 0,
                     "readingStatus": status,
                     "profileId": profile_id
@@ -278,6 +502,15 @@ def fetch_reading_states(profile_id):
         print(f"Error fetching reading states: {e}")
         return []
 
+def parse_iso_date(date_string):
+    """Parse an ISO date string to a naive UTC datetime."""
+    if not date_string:
+        return None
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
 def format_date(date_string):
     """Format ISO date string to readable format."""
     if not date_string:
@@ -374,12 +607,19 @@ def sync_letterboxd_rss():
             # Format watched date
             formatted_watched_date = None
             watched_date_sortkey = watched_date
+            watched_on = None
             if watched_date:
                 try:
                     dt = datetime.strptime(watched_date, '%Y-%m-%d')
                     formatted_watched_date = dt.strftime('%b %d, %Y')
+                    watched_on = dt
                 except:
                     formatted_watched_date = watched_date
+            if watched_on is None and pub_date:
+                try:
+                    watched_on = datetime.strptime(pub_date, '%a, %d %b %Y %H:%M:%S %z').replace(tzinfo=None)
+                except ValueError:
+                    pass
             
             # Determine if it's a review or just a watch
             is_review = 'review' in guid
@@ -405,6 +645,8 @@ def sync_letterboxd_rss():
                 'pub_date': formatted_date,
                 'watched_date': formatted_watched_date,
                 'watched_date_sortkey': watched_date_sortkey,
+                'watched_on': watched_on,
+                'year': watched_on.year if watched_on else None,
                 'is_rewatch': is_rewatch,
                 'review_text': review_text,
                 'poster_url': poster_url,
@@ -413,16 +655,18 @@ def sync_letterboxd_rss():
                 'synced_at': datetime.utcnow()
             })
         
-        # Clear old data and insert new data
+        # Append to the history; the RSS feed only carries recent entries
         if items:
-            films_collection.delete_many({})
-            films_collection.insert_many(items)
+            films_collection.bulk_write(
+                [UpdateOne({'guid': item['guid']}, {'$set': item}, upsert=True) for item in items],
+                ordered=False
+            )
             
             # Update sync timestamp
             films_sync_collection.delete_many({})
             films_sync_collection.insert_one({
                 'last_synced': datetime.utcnow(),
-                'film_count': len(items)
+                'film_count': films_collection.estimated_document_count()
             })
             
             print(f"Synced {len(items)} films to database")
@@ -450,26 +694,218 @@ def should_sync_letterboxd():
     return time_diff > 300  # 5 minutes
 
 def send_otp_email(otp):
-    """Send OTP to admin email"""
+    """Queue OTP mail for the admin. Returns the outbox message id, or None on failure.
+
+    The verify page delivers it through /admin/otp-status, so the login
+    response never waits on SMTP.
+    """
+    if not (SMTP_SERVER and SMTP_PORT and SMTP_EMAIL and ADMIN_EMAIL):
+        print("Error queueing OTP: SMTP settings are incomplete")
+        return None
     try:
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_EMAIL
-        msg['To'] = ADMIN_EMAIL
-        msg['Subject'] = 'Blog Admin Login OTP'
-        
         body = f'Your OTP for admin login is: {otp}\n\nThis OTP is valid for 10 minutes.'
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        return enqueue_email(ADMIN_EMAIL, 'Blog Admin Login OTP', body)
+    except Exception as e:
+        print(f"Error queueing OTP: {e}")
+        return None
+
+# Mail outbox
+def enqueue_email(to, subject, body):
+    """Store a message in the outbox. Returns its id.
+
+    Delivery is driven by requests (/admin/otp-status, /tasks/outbox), since
+    the worker thread may be frozen between serverless invocations; the
+    thread is only a best-effort backstop.
+    """
+    now = datetime.utcnow()
+    message_id = mail_outbox_collection.insert_one({
+        'to': to,
+        'subject': subject,
+        'body': body,
+        'status': 'pending',
+        'attempts': 0,
+        'created_at': now,
+        'next_attempt_at': now
+    }).inserted_id
+    start_outbox_worker()
+    if not has_request_context():
+        # In a request the caller drives delivery; waking the thread would
+        # let it claim the message and then be frozen mid-send
+        _outbox_wakeup.set()
+    return message_id
+
+def get_smtp_connection():
+    """Return the pooled SMTP connection, reconnecting if it has gone stale."""
+    global _smtp_connection
+
+    if _smtp_connection is not None:
+        try:
+            if _smtp_connection.noop()[0] == 250:
+                return _smtp_connection
+        except Exception:
+            pass
+        close_smtp_connection()
+
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+    if SMTP_STARTTLS:
         server.starttls()
+    if SMTP_PASSWORD:
         server.login(SMTP_EMAIL, SMTP_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(SMTP_EMAIL, ADMIN_EMAIL, text)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Error sending OTP: {e}")
-        return False
+    _smtp_connection = server
+    return server
+
+def close_smtp_connection():
+    """Drop the pooled SMTP connection."""
+    global _smtp_connection
+
+    if _smtp_connection is not None:
+        try:
+            _smtp_connection.quit()
+        except Exception:
+            pass
+    _smtp_connection = None
+
+def deliver_email(message):
+    """Send one outbox message over the pooled SMTP connection."""
+    global _smtp_last_used
+
+    msg = MIMEMultipart()
+    msg['From'] = SMTP_EMAIL
+    msg['To'] = message['to']
+    msg['Subject'] = message['subject']
+    msg.attach(MIMEText(message['body'], 'plain'))
+
+    try:
+        server = get_smtp_connection()
+        server.sendmail(SMTP_EMAIL, message['to'], msg.as_string())
+        _smtp_last_used = time.monotonic()
+    except Exception:
+        # The connection may be half-broken; never reuse it after a failure
+        close_smtp_connection()
+        raise
+
+def claim_outbox_message(message_id=None):
+    """Atomically claim the next due message (or one abandoned mid-send)."""
+    now = datetime.utcnow()
+    query = {'$or': [
+        {'status': 'pending', 'next_attempt_at': {'$lte': now}},
+        {'status': 'sending', 'claimed_at': {'$lt': now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT)}}
+    ]}
+    if message_id is not None:
+        query['_id'] = message_id
+    return mail_outbox_collection.find_one_and_update(
+        query,
+        {'$set': {'status': 'sending', 'claimed_at': now}},
+        sort=[('next_attempt_at', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def process_outbox(limit=None, message_id=None):
+    """Deliver due outbox messages (only message_id, if given), at most limit of them.
+
+    Returns the number sent.
+    """
+    sent = 0
+    attempted = 0
+    # Messages are only claimed under this lock, so a caller waiting here
+    # knows any in-flight delivery finishes before it returns
+    with _smtp_lock:
+        while limit is None or attempted < limit:
+            message = claim_outbox_message(message_id)
+            if not message:
+                break
+
+            try:
+                deliver_email(message)
+            except Exception as e:
+                attempts = message.get('attempts', 0) + 1
+                print(f"Error sending mail {message['_id']} (attempt {attempts}): {e}")
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    update = {'status': 'failed', 'attempts': attempts, 'last_error': str(e)}
+                else:
+                    backoff = OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1))
+                    update = {
+                        'status': 'pending',
+                        'attempts': attempts,
+                        'last_error': str(e),
+                        'next_attempt_at': datetime.utcnow() + timedelta(seconds=backoff)
+                    }
+                mail_outbox_collection.update_one({'_id': message['_id']}, {'$set': update})
+                attempted += 1
+                continue
+
+            attempted += 1
+            sent_at = datetime.utcnow()
+            latency_ms = (sent_at - message['created_at']).total_seconds() * 1000
+            mail_outbox_collection.update_one(
+                {'_id': message['_id']},
+                {'$set': {
+                    'status': 'sent',
+                    'attempts': message.get('attempts', 0) + 1,
+                    'sent_at': sent_at,
+                    'latency_ms': latency_ms
+                }}
+            )
+            print(f"Delivered mail {message['_id']} in {latency_ms:.0f} ms")
+            sent += 1
+
+    return sent
+
+def outbox_worker():
+    """Background loop draining the outbox; idles the SMTP connection out."""
+    while True:
+        _outbox_wakeup.wait(timeout=OUTBOX_POLL_INTERVAL)
+        _outbox_wakeup.clear()
+        try:
+            process_outbox()
+        except Exception as e:
+            print(f"Error processing mail outbox: {e}")
+        with _smtp_lock:
+            if _smtp_connection is not None and time.monotonic() - _smtp_last_used > SMTP_IDLE_TIMEOUT:
+                close_smtp_connection()
+
+def start_outbox_worker():
+    """Start the outbox worker thread once per process."""
+    global _outbox_thread
+
+    with _outbox_thread_lock:
+        if _outbox_thread is None or not _outbox_thread.is_alive():
+            _outbox_thread = threading.Thread(target=outbox_worker, name='mail-outbox', daemon=True)
+            _outbox_thread.start()
+
+def ensure_indexes():
+    """Create the indexes the listing queries rely on (idempotent)."""
+    # _id breaks created_at ties for keyset paging
+    posts_collection.create_index([('created_at', -1), ('_id', -1)])
+    posts_collection.create_index([('category_id', 1), ('created_at', -1), ('_id', -1)])
+    posts_collection.create_index([('visible', 1), ('created_at', -1), ('_id', -1)])
+    posts_collection.create_index(POST_COUNTS_INDEX)
+    posts_collection.create_index([('title', 1)])
+    films_collection.create_index([('guid', 1)], unique=True)
+    films_collection.create_index([('watched_on', -1)])
+    films_collection.create_index([('is_review', 1), ('watched_on', -1)])
+    films_collection.create_index([('year', -1)])
+    posts_collection.create_index([('visible', 1), ('views', -1)])
+    books_collection.create_index([('id', 1)], unique=True)
+    books_collection.create_index([('reading_status', 1), ('year', -1)])
+    books_collection.create_index([('reading_status', 1), ('completed_on', -1)])
+
+@app.cli.command('create-indexes')
+def create_indexes_command():
+    """Create the MongoDB indexes; run once per deploy."""
+    ensure_indexes()
+    click.echo("Indexes created")
+
+@app.before_request
+def init_instance_once():
+    """Start background workers on the first request."""
+    global _instance_initialized
+
+    if _instance_initialized:
+        return
+    _instance_initialized = True
+    start_invalidation_worker()
+    start_view_counter_worker()
 
 def login_required(f):
     """Decorator to require admin login"""
@@ -492,6 +928,944 @@ def generate_abstract(content, custom_abstract=None):
     
     return plain_text[:250] + '...' if len(plain_text) > 250 else plain_text
 
+def render_markdown(content, converter=None):
+    """Render post markdown to HTML, optionally reusing a Markdown instance"""
+    if converter is not None:
+        return converter.reset().convert(content)
+    return markdown.markdown(content, extensions=['fenced_code', 'tables'])
+
+def render_markdown_batch(contents):
+    """Render several posts with one Markdown instance (a process pool work unit)"""
+    converter = markdown.Markdown(extensions=['fenced_code', 'tables'])
+    return [render_markdown(content, converter) for content in contents]
+
+def fetch_page(collection, query, sort, page, page_size, projection=None):
+    """Fetch one page of results. Returns (items, has_next) without counting."""
+    items = list(collection.find(query, projection)
+                 .sort(sort)
+                 .skip((page - 1) * page_size)
+                 .limit(page_size + 1))
+    return items[:page_size], len(items) > page_size
+
+def encode_cursor(doc, field):
+    """Opaque keyset cursor for a document: '<field isoformat>_<_id>'."""
+    return f"{doc[field].isoformat()}_{doc['_id']}"
+
+def decode_cursor(value):
+    """Parse a cursor from encode_cursor. Returns (datetime, ObjectId) or None."""
+    stamp, _, oid = (value or '').rpartition('_')
+    if not ObjectId.is_valid(oid):
+        return None
+    try:
+        return datetime.fromisoformat(stamp), ObjectId(oid)
+    except ValueError:
+        return None
+
+def fetch_keyset_page(collection, query, field, page_size, after=None, before=None, projection=None):
+    """Fetch one page ordered newest first by (field, _id), without skip.
+
+    after pages to older documents and before to newer ones. Returns
+    (items, newer_cursor, older_cursor); a cursor is None at that end.
+    """
+    position = decode_cursor(before) or decode_cursor(after)
+    backwards = decode_cursor(before) is not None
+    if position:
+        op = '$gt' if backwards else '$lt'
+        value, oid = position
+        keyset = {'$or': [{field: {op: value}}, {field: value, '_id': {op: oid}}]}
+        query = {'$and': [query, keyset]} if query else keyset
+
+    direction = 1 if backwards else -1
+    items = list(collection.find(query, projection)
+                 .sort([(field, direction), ('_id', direction)])
+                 .limit(page_size + 1))
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backwards:
+        items.reverse()
+    if not items:
+        return items, None, None
+
+    newer = encode_cursor(items[0], field) if (has_more if backwards else position) else None
+    older = encode_cursor(items[-1], field) if (position if backwards else has_more) else None
+    return items, newer, older
+
+def valid_archive_year(year):
+    """Whether year can appear in the films/books archives."""
+    return ARCHIVE_FIRST_YEAR <= year <= datetime.utcnow().year + 1
+
+def year_range(year):
+    """Range query matching datetimes within a calendar year."""
+    return {'$gte': datetime(year, 1, 1), '$lt': datetime(year + 1, 1, 1)}
+
+def archive_years(collection, query=None):
+    """Years present in an archive collection, newest first (served by the year indexes)."""
+    return sorted((y for y in collection.distinct('year', query or {}) if y), reverse=True)
+
+# Bulk import/export (JSONL, one document per line)
+def serialize_document(doc_type, doc):
+    """Convert a Mongo document into a JSONL line for export."""
+    record = {'type': doc_type}
+    for key, value in doc.items():
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        record[key] = value
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+def parse_datetime(value):
+    """Parse an exported ISO timestamp, falling back to now."""
+    if not value:
+        return datetime.utcnow()
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return datetime.utcnow()
+
+def parse_object_id(value):
+    """Return value as an ObjectId, or None if it is not a valid one."""
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+def iter_export_lines():
+    """Yield categories, then posts, as JSONL without loading the archive in memory."""
+    for category in categories_collection.find().sort('_id', 1).batch_size(BULK_BATCH_SIZE):
+        yield serialize_document('category', category)
+    # content_html is derived, so it is regenerated on import rather than exported
+    for post in posts_collection.find({}, {'content_html': 0}).sort('_id', 1).batch_size(BULK_BATCH_SIZE):
+        yield serialize_document('post', post)
+
+def optional_str(value):
+    """value if it is a string, else None (for loosely typed import fields)."""
+    return value if isinstance(value, str) else None
+
+def import_content(lines):
+    """Import JSONL categories and posts in batches. Returns counts per type.
+
+    Exported _ids are kept, so importing an export into the database it came
+    from updates the existing posts instead of duplicating them. Lines that
+    are not valid UTF-8 JSON records of the expected shape are skipped.
+    Markdown is not rendered here (it caps imports at a few hundred posts/s);
+    content_html is left unset and filled by render_pending_content() or on
+    first view.
+    """
+    counts = {'categories': 0, 'posts': 0, 'skipped': 0}
+    category_ids = {}  # exported category _id -> _id in this database
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            posts_collection.bulk_write(batch, ordered=False)
+            counts['posts'] += len(batch)
+        except BulkWriteError as e:
+            failed = len(e.details.get('writeErrors', []))
+            print(f"Error importing posts: {failed} of {len(batch)} writes failed")
+            counts['posts'] += len(batch) - failed
+            counts['skipped'] += failed
+        finally:
+            batch.clear()
+
+    try:
+        for line in lines:
+            try:
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                record = json.loads(line) if line.strip() else None
+            except ValueError:  # includes UnicodeDecodeError
+                counts['skipped'] += 1
+                continue
+            if record is None:
+                continue
+            if not isinstance(record, dict):
+                counts['skipped'] += 1
+                continue
+
+            if record.get('type') == 'category' and optional_str(record.get('name')):
+                # Reuse the same category, or one of the same name, instead of duplicating it
+                exported_id = parse_object_id(record.get('_id'))
+                existing = None
+                if exported_id:
+                    existing = categories_collection.find_one({'_id': exported_id}, {'_id': 1})
+                if not existing:
+                    existing = categories_collection.find_one({'name': record['name']}, {'_id': 1})
+                if existing:
+                    new_id = existing['_id']
+                else:
+                    category = {
+                        'name': record['name'],
+                        'visible': bool(record.get('visible', True)),
+                        'created_at': parse_datetime(record.get('created_at'))
+                    }
+                    if exported_id:
+                        category['_id'] = exported_id
+                    new_id = categories_collection.insert_one(category).inserted_id
+                    counts['categories'] += 1
+                if optional_str(record.get('_id')):
+                    category_ids[record['_id']] = str(new_id)
+
+            elif (record.get('type') == 'post' and optional_str(record.get('title'))
+                    and optional_str(record.get('content'))):
+                content = record['content']
+                created_at = parse_datetime(record.get('created_at'))
+                category_id = optional_str(record.get('category_id'))
+                post = {
+                    'title': record['title'],
+                    'tagline': optional_str(record.get('tagline')),
+                    'abstract': generate_abstract(content, optional_str(record.get('abstract'))),
+                    'content': content,
+                    'category_id': category_ids.get(category_id, category_id),
+                    'visible': bool(record.get('visible', True)),
+                    'created_at': created_at,
+                    'updated_at': parse_datetime(record.get('updated_at')) if record.get('updated_at') else created_at
+                }
+                views = record.get('views')
+                views = views if isinstance(views, int) and not isinstance(views, bool) else 0
+                exported_id = parse_object_id(record.get('_id'))
+                if exported_id:
+                    # Live view counts win over the exported ones on re-import;
+                    # stale HTML from the previous content is dropped
+                    batch.append(UpdateOne(
+                        {'_id': exported_id},
+                        {'$set': post, '$unset': {'content_html': ''}, '$setOnInsert': {'views': views}},
+                        upsert=True
+                    ))
+                else:
+                    batch.append(InsertOne({**post, 'views': views}))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    flush()
+
+            else:
+                counts['skipped'] += 1
+    finally:
+        # Whatever was read is written and published, even if the upload broke off
+        flush()
+        if counts['categories'] or counts['posts']:
+            bump_content_version(categories=bool(counts['categories']))
+    return counts
+
+def render_pending_content(workers=None):
+    """Fill content_html for posts that lack it, rendering in a process pool.
+
+    Returns the number of posts rendered. Posts edited meanwhile keep the
+    HTML their edit stored.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            posts = list(posts_collection.find({'content_html': {'$exists': False}}, {'content': 1})
+                         .limit(BULK_BATCH_SIZE))
+            if not posts:
+                break
+            contents = [post.get('content') or '' for post in posts]
+            chunks = [contents[i:i + RENDER_CHUNK_SIZE] for i in range(0, len(contents), RENDER_CHUNK_SIZE)]
+            html = [body for chunk in pool.map(render_markdown_batch, chunks) for body in chunk]
+            posts_collection.bulk_write([
+                UpdateOne({'_id': post['_id'], 'content': post.get('content'), 'content_html': {'$exists': False}},
+                          {'$set': {'content_html': body}})
+                for post, body in zip(posts, html)
+            ], ordered=False)
+            rendered += len(posts)
+    return rendered
+
+@app.cli.command('export-content')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def export_content_command(path):
+    """Export all categories and posts to a JSONL file."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in iter_export_lines():
+            f.write(line)
+            count += 1
+    click.echo(f"Exported {count} documents to {path}")
+
+@app.cli.command('import-content')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--defer-render', is_flag=True, help='Leave content_html to render-content or first view.')
+@click.option('--workers', type=int, default=None, help='Render processes (default: CPU count).')
+def import_content_command(path, defer_render, workers):
+    """Import categories and posts from a JSONL file."""
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        counts = import_content(f)
+    elapsed = time.perf_counter() - start
+    rate = counts['posts'] / elapsed if elapsed else 0
+    click.echo(f"Imported {counts['categories']} categories and {counts['posts']} posts "
+               f"({counts['skipped']} skipped) in {elapsed:.2f}s, {rate:.0f} posts/s")
+    if not defer_render:
+        render_content(workers)
+
+@app.cli.command('render-content')
+@click.option('--workers', type=int, default=None, help='Render processes (default: CPU count).')
+def render_content_command(workers):
+    """Render content_html for posts imported without it."""
+    render_content(workers)
+
+def render_content(workers):
+    """Run render_pending_content() and report its rate."""
+    start = time.perf_counter()
+    rendered = render_pending_content(workers)
+    elapsed = time.perf_counter() - start
+    rate = rendered / elapsed if elapsed else 0
+    click.echo(f"Rendered {rendered} posts in {elapsed:.2f}s, {rate:.0f} posts/s")
+
+# Self-hosted fonts
+def font_assets():
+    """Return the built font manifest, or None to fall back to Google Fonts."""
+    if not _font_assets['loaded']:
+        try:
+            with open(FONTS_MANIFEST, 'r', encoding='utf-8') as f:
+                _font_assets['manifest'] = json.load(f)
+        except (OSError, ValueError):
+            print(f"No font manifest at {FONTS_MANIFEST}; serving Google Fonts (run 'flask build-fonts' and commit static/fonts)")
+            _font_assets['manifest'] = None
+        _font_assets['loaded'] = True
+    return _font_assets['manifest']
+
+app.jinja_env.globals['font_assets'] = font_assets
+
+@app.after_request
+def cache_hashed_fonts(response):
+    """Content-hashed font files never change, so let browsers keep them forever."""
+    fonts_path = f"{app.static_url_path}/fonts/"
+    if (response.status_code == 200 and request.path.startswith(fonts_path)
+            and not request.path.endswith('manifest.json')):
+        response.headers['Cache-Control'] = FONT_CACHE_CONTROL
+    return response
+
+def site_glyphs():
+    """Characters the fonts must cover: the base set plus anything in the templates."""
+    glyphs = set(FONT_BASE_GLYPHS)
+    for path in glob.glob(os.path.join(app.root_path, app.template_folder, '*.html')):
+        with open(path, 'r', encoding='utf-8') as f:
+            glyphs.update(ch for ch in f.read() if ord(ch) >= 0x20)
+    return ''.join(sorted(glyphs))
+
+def download_font_sources():
+    """Download any missing TTFs listed in FONT_FACES from Google Fonts."""
+    missing = [face for face in FONT_FACES if not os.path.exists(os.path.join(FONTS_SOURCE_DIR, face[2]))]
+    if not missing:
+        return
+
+    # Without a browser User-Agent Google Fonts serves plain TrueType files
+    try:
+        response = requests.get(GOOGLE_FONTS_CSS_URL, timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise click.ClickException(f"Could not reach Google Fonts ({e}); put the TTFs in {FONTS_SOURCE_DIR}")
+    sources = {}
+    for block in re.findall(r'@font-face\s*{([^}]*)}', response.text):
+        family = re.search(r"font-family:\s*'([^']+)'", block)
+        weight = re.search(r'font-weight:\s*(\d+)', block)
+        url = re.search(r'src:\s*url\(([^)]+)\)', block)
+        if family and weight and url:
+            sources[(family.group(1), int(weight.group(1)))] = url.group(1)
+
+    os.makedirs(FONTS_SOURCE_DIR, exist_ok=True)
+    for family, weight, filename, _ in missing:
+        url = sources.get((family, weight))
+        if not url:
+            raise click.ClickException(f"Google Fonts did not return {family} {weight}")
+        font_response = requests.get(url, timeout=30)
+        font_response.raise_for_status()
+        with open(os.path.join(FONTS_SOURCE_DIR, filename), 'wb') as f:
+            f.write(font_response.content)
+        click.echo(f"Downloaded {family} {weight} -> {filename}")
+
+@app.cli.command('build-fonts')
+def build_fonts_command():
+    """Subset the site fonts to WOFF2 with content-hashed names.
+
+    Reads TTFs from FONTS_SOURCE_DIR, downloading missing ones once. Needs
+    the build-only packages fonttools and brotli.
+
+    Nothing in vercel.json runs this. Run it on a machine with network
+    access and commit static/fonts/; until then pages use Google Fonts.
+    """
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        raise click.ClickException("build-fonts needs fonttools and brotli: pip install fonttools brotli")
+
+    download_font_sources()
+    glyphs = site_glyphs()
+    os.makedirs(FONTS_OUTPUT_DIR, exist_ok=True)
+
+    faces = []
+    preload = []
+    outputs = set()
+    for family, weight, filename, should_preload in FONT_FACES:
+        source = os.path.join(FONTS_SOURCE_DIR, filename)
+        options = subset.Options()
+        options.flavor = 'woff2'
+        font = TTFont(source)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=glyphs)
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        subset.save_font(font, buffer, options)
+        data = buffer.getvalue()
+
+        slug = family.lower().replace(' ', '-')
+        output = f"{slug}-{weight}.{hashlib.sha256(data).hexdigest()[:10]}.woff2"
+        with open(os.path.join(FONTS_OUTPUT_DIR, output), 'wb') as f:
+            f.write(data)
+        outputs.add(output)
+        if should_preload:
+            preload.append(f"fonts/{output}")
+        # The @font-face rules are inlined by font_links.html, so no stylesheet blocks render
+        faces.append({'family': family, 'weight': weight, 'file': f"fonts/{output}"})
+        click.echo(f"{family} {weight}: {os.path.getsize(source)} -> {len(data)} bytes ({output})")
+
+    # Remove files from previous builds
+    for path in glob.glob(os.path.join(FONTS_OUTPUT_DIR, '*')):
+        name = os.path.basename(path)
+        if name != 'manifest.json' and name not in outputs:
+            os.remove(path)
+
+    with open(FONTS_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump({'faces': faces, 'preload': preload}, f, indent=4)
+    _font_assets['loaded'] = False
+    click.echo(f"Wrote {len(faces)} fonts and manifest.json to {FONTS_OUTPUT_DIR}")
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Precompile template bytecode into JINJA_BYTECODE_DIR for upload with a deploy.
+
+    Nothing in vercel.json runs this: the legacy @vercel/python build has no
+    build hook. Run it before 'vercel deploy', under the runtime's Python
+    version; Git-triggered deploys ship without it and compile into /tmp.
+    """
+    os.makedirs(JINJA_BYTECODE_DIR, exist_ok=True)
+    bytecode_cache = ShippedBytecodeCache(JINJA_BYTECODE_DIR, JINJA_BYTECODE_DIR)
+    bytecode_cache.clear()
+    env = app.create_jinja_environment()
+    env.bytecode_cache = bytecode_cache
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    click.echo(f"Compiled {len(names)} templates to {JINJA_BYTECODE_DIR} "
+               f"(Python {sys.version_info[0]}.{sys.version_info[1]}; deploy with the same version)")
+
+@app.cli.command('bench-templates')
+@click.option('--iterations', default=500, show_default=True)
+def bench_templates_command(iterations):
+    """Benchmark template rendering with and without the fragment cache."""
+    now = datetime.utcnow()
+    categories = [{'_id': ObjectId(), 'name': f'category {i}', 'visible': True} for i in range(12)]
+    posts = [{
+        '_id': ObjectId(),
+        'title': f'post {i}',
+        'tagline': 'a tagline',
+        'abstract': 'lorem ipsum ' * 20,
+        'category_name': 'category 0',
+        'created_at': now,
+        'updated_at': now
+    } for i in range(20)]
+    contexts = {
+        'blog.html': {'posts': posts, 'current_page': 'home'},
+        'post.html': {'post': dict(posts[0], content_html='<p>' + 'lorem ipsum ' * 400 + '</p>')},
+        'books.html': {'currently_reading': [], 'finished': [], 'want_to_read': [],
+                       'years': [], 'year': None, 'page': 1, 'has_next': False,
+                       'error': False, 'last_synced': None, 'now': now, 'current_page': 'books'},
+        'films.html': {'films': [], 'total_count': 0, 'review_count': 0,
+                       'years': [], 'year': None, 'page': 1, 'has_next': False,
+                       'error': False, 'last_synced': None, 'now': now, 'current_page': 'films'}
+    }
+
+    # Cold start: a fresh environment and an empty /tmp, as on a new instance
+    with tempfile.TemporaryDirectory() as shipped_dir:
+        compile_env = app.create_jinja_environment()
+        compile_env.bytecode_cache = ShippedBytecodeCache(shipped_dir, shipped_dir)
+        for name in contexts:
+            compile_env.get_template(name)
+
+        for label, shipped in (('no bytecode cache', None), ('precompiled bundle', shipped_dir)):
+            with tempfile.TemporaryDirectory() as empty_tmp:
+                env = app.create_jinja_environment()
+                env.bytecode_cache = ShippedBytecodeCache(shipped, empty_tmp) if shipped else None
+                start = time.perf_counter()
+                for name in contexts:
+                    env.get_template(name)
+                click.echo(f"cold load, {label}: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    saved_cache = app.jinja_env.fragment_cache
+    try:
+        for label, fragment_cache in (('before (no fragment cache)', None), ('after (fragment cache)', {})):
+            app.jinja_env.fragment_cache = fragment_cache
+            click.echo(label)
+            for name, context in contexts.items():
+                with app.test_request_context('/'):
+                    render_template(name, categories=categories, categories_version=lambda: 1, **context)
+                    start = time.perf_counter()
+                    for _ in range(iterations):
+                        render_template(name, categories=categories, categories_version=lambda: 1, **context)
+                    per_request = (time.perf_counter() - start) / iterations * 1000
+                click.echo(f"  {name:<12} {per_request:.3f} ms/request")
+    finally:
+        app.jinja_env.fragment_cache = saved_cache
+
+# Content versioning
+def bump_content_version(categories=False):
+    """Mark published content as changed so feeds and cached fragments are regenerated."""
+    inc = {'version': 1}
+    if categories:
+        inc['categories_version'] = 1
+    doc = meta_collection.find_one_and_update(
+        {'_id': 'content_version'},
+        {'$inc': inc, '$set': {'updated_at': datetime.utcnow().replace(microsecond=0)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _content_version.update(version=doc['version'],
+                            categories_version=doc.get('categories_version', 0),
+                            updated_at=doc['updated_at'],
+                            checked_at=time.time())
+    _feed_cache.clear()
+
+def change_stream_live():
+    """True while the change stream is open and answered recently."""
+    return (_invalidation['mode'] == 'change_stream' and
+            time.time() - _invalidation['heartbeat_at'] < CHANGE_STREAM_HEARTBEAT_TIMEOUT)
+
+def refresh_content_version():
+    """Re-read the version document once its TTL has passed or it was invalidated."""
+    # Wall-clock time, so a frozen serverless instance sees the gap when it thaws
+    now = time.time()
+    ttl = CONTENT_VERSION_TTL_WATCHED if change_stream_live() else CONTENT_VERSION_TTL
+    if _content_version['version'] is None or now - _content_version['checked_at'] > ttl:
+        doc = meta_collection.find_one({'_id': 'content_version'}) or {}
+        _content_version.update(version=doc.get('version', 0),
+                                categories_version=doc.get('categories_version', 0),
+                                updated_at=doc.get('updated_at') or datetime.utcnow().replace(microsecond=0),
+                                checked_at=now)
+
+def get_content_version():
+    """Return (version, updated_at) of published content."""
+    refresh_content_version()
+    return _content_version['version'], _content_version['updated_at']
+
+def get_categories_version():
+    """Return the version of the category list, used to key cached nav fragments."""
+    refresh_content_version()
+    return _content_version['categories_version']
+
+app.jinja_env.globals['categories_version'] = get_categories_version
+
+def get_post_counts():
+    """Total and visible post counts per category_id, recomputed only when content changes.
+
+    Every post write bumps the content version, so the aggregation runs once
+    per change per instance instead of on every dashboard load.
+    """
+    # Read the version directly: the admin must see their own write at once
+    doc = meta_collection.find_one({'_id': 'content_version'}, {'version': 1}) or {}
+    version = doc.get('version', 0)
+    if _post_counts['version'] == version:
+        return _post_counts['by_category']
+
+    # Covered by the (category_id, visible) index, so no post documents are fetched
+    pipeline = [
+        {'$project': {'_id': 0, 'category_id': 1, 'visible': 1}},
+        {'$group': {
+            '_id': '$category_id',
+            'total': {'$sum': 1},
+            'visible': {'$sum': {'$cond': [{'$eq': ['$visible', True]}, 1, 0]}}
+        }}
+    ]
+    try:
+        rows = list(posts_collection.aggregate(pipeline, hint=POST_COUNTS_INDEX))
+    except OperationFailure:
+        # Index not created yet (flask create-indexes); fall back to a scan
+        rows = list(posts_collection.aggregate(pipeline))
+    by_category = {row['_id']: row for row in rows}
+    _post_counts.update(version=version, by_category=by_category)
+    return by_category
+
+# Cross-instance cache invalidation
+def invalidate_caches(collection_name=None, document_id=None):
+    """Evict in-process caches affected by a write to collection_name (None: all).
+
+    Feeds and nav fragments are keyed by the content version, so a meta write
+    only needs a re-read of it. A posts write re-ranks popular posts only if
+    document_id is unknown or already in the ranking.
+    """
+    if collection_name in (None, 'meta'):
+        _content_version['checked_at'] = 0.0  # force a re-read of the version document
+        _feed_cache.clear()
+    if collection_name in (None, 'categories'):
+        fragment_cache = app.jinja_env.fragment_cache
+        if fragment_cache is not None:
+            fragment_cache.clear()
+    if collection_name in (None, 'posts'):
+        ranked = {post['_id'] for post in _popular_posts['posts'] or []}
+        if collection_name is None or document_id is None or document_id in ranked:
+            _popular_posts['refreshed_at'] = 0.0  # re-rank on the next worker pass
+
+def watch_changes():
+    """Invalidate caches from a change stream; returns False if streams are unsupported."""
+    pipeline = [{'$match': {
+        'ns.coll': {'$in': INVALIDATION_COLLECTIONS},
+        # View counter flushes only touch 'views' and must not evict anything
+        '$nor': [{'operationType': 'update', 'updateDescription.updatedFields.views': {'$exists': True}}]
+    }}]
+    resume_token = None
+
+    while True:
+        try:
+            with db.watch(pipeline, resume_after=resume_token, max_await_time_ms=CHANGE_STREAM_AWAIT_MS) as stream:
+                if _invalidation['mode'] != 'change_stream':
+                    # Anything written before the stream opened may have been missed
+                    invalidate_caches()
+                    _invalidation['heartbeat_at'] = time.time()
+                    _invalidation['mode'] = 'change_stream'
+                while stream.alive:
+                    # Returns None after CHANGE_STREAM_AWAIT_MS without changes
+                    change = stream.try_next()
+                    _invalidation['heartbeat_at'] = time.time()
+                    resume_token = stream.resume_token
+                    if change is not None:
+                        invalidate_caches(change['ns']['coll'], change.get('documentKey', {}).get('_id'))
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                _invalidation['mode'] = None
+                return False
+            if e.code == CHANGE_STREAM_HISTORY_LOST:
+                resume_token = None
+            print(f"Error watching changes: {e}")
+        except PyMongoError as e:
+            print(f"Error watching changes: {e}")
+
+        _invalidation['mode'] = None
+        time.sleep(INVALIDATION_RETRY_DELAY)
+
+def poll_content_version():
+    """Fallback invalidation: poll the version document for changes."""
+    _invalidation['mode'] = 'polling'
+    last_seen = None
+
+    while True:
+        try:
+            doc = meta_collection.find_one({'_id': 'content_version'}) or {}
+            seen = (doc.get('version', 0), doc.get('categories_version', 0))
+            if last_seen is not None and seen != last_seen:
+                invalidate_caches('meta')
+                invalidate_caches('posts')
+                if seen[1] != last_seen[1]:
+                    invalidate_caches('categories')
+            last_seen = seen
+        except PyMongoError as e:
+            print(f"Error polling content version: {e}")
+        time.sleep(INVALIDATION_POLL_INTERVAL)
+
+def invalidation_worker():
+    """Use change streams when the deployment supports them, otherwise poll."""
+    if not watch_changes():
+        print("Change streams unavailable, polling for cache invalidation")
+        poll_content_version()
+
+def start_invalidation_worker():
+    """Start the invalidation thread once per process."""
+    global _invalidation_thread
+
+    with _invalidation_thread_lock:
+        if _invalidation_thread is None or not _invalidation_thread.is_alive():
+            _invalidation_thread = threading.Thread(target=invalidation_worker, name='cache-invalidation', daemon=True)
+            _invalidation_thread.start()
+
+# View counters and popular posts
+def record_view(post_id):
+    """Count a post view in memory; the worker flushes counts in batches."""
+    global _view_events
+
+    with _view_lock:
+        _view_counts[post_id] = _view_counts.get(post_id, 0) + 1
+        _view_events += 1
+        flush_due = _view_events >= VIEW_FLUSH_EVENTS
+    if flush_due:
+        _view_flush_wakeup.set()
+
+def merge_view_counts(counts):
+    """Put unflushed (post_id, views) pairs back so the next flush retries them."""
+    global _view_events
+
+    with _view_lock:
+        for post_id, n in counts:
+            _view_counts[post_id] = _view_counts.get(post_id, 0) + n
+            _view_events += n
+
+def flush_view_counts():
+    """Write buffered view counts with a single bulk_write. Returns posts updated."""
+    global _view_counts, _view_events
+
+    with _view_lock:
+        counts, _view_counts = list(_view_counts.items()), {}
+        _view_events = 0
+    if not counts:
+        return 0
+
+    try:
+        posts_collection.bulk_write(
+            [UpdateOne({'_id': ObjectId(post_id)}, {'$inc': {'views': n}}) for post_id, n in counts],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # Unordered: every op except those listed in writeErrors was applied
+        failed = [counts[error['index']] for error in e.details.get('writeErrors', [])]
+        print(f"Error flushing view counts: {len(failed)} of {len(counts)} updates failed")
+        merge_view_counts(failed)
+        return len(counts) - len(failed)
+    except Exception as e:
+        print(f"Error flushing view counts: {e}")
+        merge_view_counts(counts)
+        return 0
+    return len(counts)
+
+def refresh_popular_posts():
+    """Recompute the popular posts ranking from flushed view counts."""
+    posts = list(posts_collection.find(
+        {'visible': True, 'views': {'$gt': 0}},
+        {'title': 1, 'tagline': 1, 'views': 1}
+    ).sort('views', -1).limit(POPULAR_POSTS_LIMIT))
+    _popular_posts.update(posts=posts, refreshed_at=time.monotonic())
+
+def get_popular_posts():
+    """Return the precomputed ranking, loading it once if the worker has not yet."""
+    if _popular_posts['posts'] is None:
+        try:
+            refresh_popular_posts()
+        except Exception as e:
+            print(f"Error loading popular posts: {e}")
+            return []
+    return _popular_posts['posts']
+
+def view_counter_worker():
+    """Flush view counts every VIEW_FLUSH_INTERVAL (or when enough are buffered)."""
+    while True:
+        _view_flush_wakeup.wait(timeout=VIEW_FLUSH_INTERVAL)
+        _view_flush_wakeup.clear()
+        flush_view_counts()
+        if time.monotonic() - _popular_posts['refreshed_at'] > POPULAR_REFRESH_INTERVAL:
+            try:
+                refresh_popular_posts()
+            except Exception as e:
+                print(f"Error refreshing popular posts: {e}")
+
+def start_view_counter_worker():
+    """Start the view counter thread once per process."""
+    global _view_thread
+
+    with _view_thread_lock:
+        if _view_thread is None or not _view_thread.is_alive():
+            _view_thread = threading.Thread(target=view_counter_worker, name='view-counter', daemon=True)
+            _view_thread.start()
+
+# Merge buffered views into Mongo when the process exits
+atexit.register(flush_view_counts)
+
+@app.cli.command('bench-views')
+@click.option('--requests', 'total', default=4000, show_default=True)
+@click.option('--threads', default=8, show_default=True)
+@click.option('--rounds', default=5, show_default=True)
+def bench_views_command(total, threads, rounds):
+    """Time view_post() under concurrent load, with and without record_view()."""
+    global _instance_initialized, _view_events, posts_collection, categories_collection, meta_collection, record_view
+
+    saved = (_instance_initialized, posts_collection, categories_collection, meta_collection, record_view)
+    try:
+        client.admin.command('ping')
+        post_ids = [str(post['_id']) for post in posts_collection.find({'visible': True}, {'_id': 1}).limit(50)]
+    except PyMongoError:
+        post_ids = []
+    if not post_ids:
+        try:
+            import mongomock
+        except ImportError:
+            raise click.ClickException("No reachable posts; install mongomock to bench against in-memory data")
+        stub = mongomock.MongoClient()['blog_database']
+        posts_collection, categories_collection, meta_collection = stub['posts'], stub['categories'], stub['meta']
+        content = '# heading\n\n' + 'lorem ipsum dolor sit amet ' * 200
+        post_ids = [str(posts_collection.insert_one({
+            'title': f'post {i}',
+            'content': content,
+            'content_html': render_markdown(content),
+            'visible': True,
+            'created_at': datetime.utcnow()
+        }).inserted_id) for i in range(50)]
+        click.echo("MongoDB unreachable or empty; using in-memory collections")
+
+    def run():
+        per_thread = total // threads
+        def work(offset):
+            with app.test_client() as http:
+                for i in range(per_thread):
+                    http.get(f"/post/{post_ids[(offset + i) % len(post_ids)]}")
+        workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        return per_thread * threads / elapsed, elapsed / per_thread * 1000
+
+    # Workers stay off, so nothing the benchmark counts is flushed
+    _instance_initialized = True
+    counting, no_counting = record_view, lambda post_id: None
+    results = {counting: [], no_counting: []}
+    try:
+        record_view = no_counting
+        run()  # warm templates and caches
+        # Alternate the variants and keep the best round of each to damp noise
+        for _ in range(rounds):
+            for variant in results:
+                record_view = variant
+                results[variant].append(run())
+    finally:
+        _instance_initialized, posts_collection, categories_collection, meta_collection, record_view = saved
+        with _view_lock:
+            buffered = sum(_view_counts.values())
+            _view_counts.clear()
+            _view_events = 0
+
+    baseline_rps, baseline_ms = max(results[no_counting])
+    counted_rps, counted_ms = max(results[counting])
+    click.echo(f"{threads} threads, {total} GET /post/<id> over {len(post_ids)} posts, best of {rounds}")
+    click.echo(f"  no counting:  {baseline_rps:.0f} req/s, {baseline_ms:.3f} ms/request")
+    click.echo(f"  record_view:  {counted_rps:.0f} req/s, {counted_ms:.3f} ms/request "
+               f"({counted_ms - baseline_ms:+.3f} ms)")
+    click.echo(f"  buffered {buffered} views (dropped, not flushed)")
+
+# Feed and sitemap
+def site_base_url():
+    """Canonical scheme://host for absolute links, or None if not configured."""
+    if SITE_URL:
+        return SITE_URL
+    if app.config.get('SERVER_NAME'):
+        return f"{app.config['PREFERRED_URL_SCHEME']}://{app.config['SERVER_NAME']}"
+    return None
+
+def feeds_available():
+    """Whether /feed.xml and /sitemap.xml can be served (SITE_URL is configured)."""
+    return site_base_url() is not None
+
+app.jinja_env.globals['feeds_available'] = feeds_available
+
+def canonical_url(endpoint, **values):
+    """Absolute URL for an endpoint on the canonical origin."""
+    return site_base_url() + url_for(endpoint, **values)
+
+def build_feed_xml():
+    """Build the RSS 2.0 feed of the latest visible posts."""
+    rss = ET.Element('rss', version='2.0')
+    channel = ET.SubElement(rss, 'channel')
+    ET.SubElement(channel, 'title').text = 'aaditya rengarajan · blog'
+    ET.SubElement(channel, 'link').text = canonical_url('home')
+    ET.SubElement(channel, 'description').text = 'cybersecurity & ml researcher · ph.d. aspirant'
+
+    posts = posts_collection.find(
+        {'visible': True},
+        {'title': 1, 'tagline': 1, 'abstract': 1, 'created_at': 1}
+    ).sort('created_at', -1).limit(FEED_POST_LIMIT)
+
+    for post in posts:
+        link = canonical_url('view_post', post_id=post['_id'])
+        item = ET.SubElement(channel, 'item')
+        ET.SubElement(item, 'title').text = post['title']
+        ET.SubElement(item, 'link').text = link
+        ET.SubElement(item, 'guid', isPermaLink='true').text = link
+        ET.SubElement(item, 'pubDate').text = format_datetime(post['created_at'].replace(tzinfo=timezone.utc), usegmt=True)
+        ET.SubElement(item, 'description').text = post.get('abstract') or post.get('tagline') or ''
+
+    return ET.tostring(rss, encoding='utf-8', xml_declaration=True)
+
+def build_sitemap_xml():
+    """Build the sitemap of public pages, categories and posts."""
+    urlset = ET.Element('urlset', xmlns='http://www.sitemaps.org/schemas/sitemap/0.9')
+
+    def add_url(loc, lastmod=None):
+        url = ET.SubElement(urlset, 'url')
+        ET.SubElement(url, 'loc').text = loc
+        if lastmod:
+            ET.SubElement(url, 'lastmod').text = lastmod.strftime('%Y-%m-%d')
+
+    add_url(canonical_url('home'))
+    add_url(canonical_url('books'))
+    add_url(canonical_url('films'))
+    for category in categories_collection.find({'visible': True}, {'_id': 1}):
+        add_url(canonical_url('category_page', category_id=category['_id']))
+    for post in posts_collection.find({'visible': True}, {'created_at': 1, 'updated_at': 1}).batch_size(BULK_BATCH_SIZE):
+        add_url(canonical_url('view_post', post_id=post['_id']),
+                post.get('updated_at') or post.get('created_at'))
+
+    return ET.tostring(urlset, encoding='utf-8', xml_declaration=True)
+
+FEED_BUILDERS = {
+    'feed.xml': build_feed_xml,
+    'sitemap.xml': build_sitemap_xml
+}
+
+def get_feed(name):
+    """Return the stored feed for the current content version, regenerating it if stale."""
+    version, updated_at = get_content_version()
+    base_url = site_base_url()
+
+    entry = _feed_cache.get(name)
+    if entry and entry['version'] == version and entry.get('base_url') == base_url:
+        return entry
+
+    entry = feeds_collection.find_one({'_id': name})
+    if not entry or entry.get('version') != version or entry.get('base_url') != base_url:
+        body = FEED_BUILDERS[name]()
+        entry = {
+            '_id': name,
+            'version': version,
+            'base_url': base_url,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'last_modified': updated_at,
+            'body_gzip': gzip.compress(body, mtime=0)
+        }
+        feeds_collection.replace_one({'_id': name}, entry, upsert=True)
+
+    entry['body_gzip'] = bytes(entry['body_gzip'])
+    _feed_cache[name] = entry
+    return entry
+
+def serve_feed(name, mimetype):
+    """Serve a precompressed feed with ETag/Last-Modified revalidation."""
+    if not site_base_url():
+        print("SITE_URL is not set (see .env.example); refusing to build feeds from the Host header")
+        return "Feed unavailable", 503
+
+    entry = get_feed(name)
+    # The gzip and identity bodies differ, so each gets its own validator
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = f"{entry['etag']}-gzip" if use_gzip else entry['etag']
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = bool(request.if_modified_since and
+                            request.if_modified_since.replace(tzinfo=None) >= entry['last_modified'])
+
+    if not_modified:
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(entry['body_gzip'], mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(gzip.decompress(entry['body_gzip']), mimetype=mimetype)
+
+    response.set_etag(etag)
+    response.last_modified = entry['last_modified']
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def home():
     """Home page showing all visible posts"""
@@ -507,6 +1881,7 @@ def home():
     return render_template('blog.html', 
                          categories=visible_categories, 
                          posts=visible_posts, 
+                         popular_posts=get_popular_posts(),
                          current_page='home')
 
 @app.route('/category/<category_id>')
@@ -546,7 +1921,13 @@ def view_post(post_id):
         post['category_name'] = category['name'] if category else 'Uncategorized'
     
     # Convert markdown to HTML
-    post['content_html'] = markdown.markdown(post['content'], extensions=['fenced_code', 'tables'])
+    if not post.get('content_html'):
+        # Imported posts are rendered lazily; store it so this happens once
+        post['content_html'] = render_markdown(post['content'])
+        posts_collection.update_one({'_id': post['_id'], 'content': post['content']},
+                                    {'$set': {'content_html': post['content_html']}})
+    
+    record_view(str(post['_id']))
     
     return render_template('post.html', 
                          categories=visible_categories, 
@@ -570,10 +1951,11 @@ def admin_login():
                 'created_at': datetime.utcnow()
             })
             
-            # Send OTP
-            if send_otp_email(otp):
+            # Queue the OTP; the verify page delivers it and shows the outcome
+            message_id = send_otp_email(otp)
+            if message_id:
                 session['otp_verified'] = False
-                flash('OTP sent to your device!', 'success')
+                session['otp_message_id'] = str(message_id)
                 return redirect(url_for('verify_otp'))
             else:
                 flash('Error sending OTP. Check device configuration.', 'error')
@@ -597,6 +1979,7 @@ def verify_otp():
             if time_diff < 600:  # 10 minutes
                 session['admin_logged_in'] = True
                 otps_collection.delete_many({})  # Clear OTP
+                session.pop('otp_message_id', None)
                 return redirect(url_for('admin_dashboard'))
             else:
                 flash('OTP expired. Please login again.', 'error')
@@ -604,7 +1987,30 @@ def verify_otp():
         else:
             flash('Invalid OTP', 'error')
     
-    return render_template('verify_otp.html')
+    return render_template('verify_otp.html', otp_pending='otp_message_id' in session)
+
+@app.route('/admin/otp-status')
+def otp_status():
+    """Deliver the pending OTP mail if it is due and report its status"""
+    message_id = parse_object_id(session.get('otp_message_id'))
+    if not message_id:
+        return jsonify({'status': 'unknown'}), 404
+
+    try:
+        process_outbox(limit=1, message_id=message_id)
+    except Exception as e:
+        print(f"Error processing mail outbox: {e}")
+    message = mail_outbox_collection.find_one({'_id': message_id}, {'status': 1, 'last_error': 1}) or {}
+    return jsonify({'status': message.get('status', 'unknown'), 'error': message.get('last_error')})
+
+@app.route('/tasks/outbox', methods=['GET', 'POST'])
+def drain_outbox():
+    """Deliver due mail; hit by a scheduler with Authorization: Bearer CRON_SECRET"""
+    if not CRON_SECRET:
+        return "Not found", 404
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {CRON_SECRET}"):
+        return "Unauthorized", 401
+    return jsonify({'sent': process_outbox(limit=OUTBOX_CRON_DRAIN_LIMIT)})
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -618,17 +2024,50 @@ def admin_logout():
 def admin_dashboard():
     """Admin dashboard"""
     categories = list(categories_collection.find().sort('name', 1))
-    posts = list(posts_collection.find().sort('created_at', -1))
-    
-    # Add category names to posts
+    category_names = {str(c['_id']): c['name'] for c in categories}
+
+    # Filters from the query string
+    category_filter = request.args.get('category', '')
+    visibility_filter = request.args.get('visibility', '')
+    title_filter = request.args.get('q', '').strip()
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    query = {}
+    if category_filter:
+        query['category_id'] = category_filter
+    if visibility_filter in ('visible', 'hidden'):
+        query['visible'] = visibility_filter == 'visible'
+    if title_filter:
+        # Anchored prefix regex so the title index can be used
+        query['title'] = {'$regex': '^' + re.escape(title_filter)}
+
+    posts, newer, older = fetch_keyset_page(posts_collection, query, 'created_at', ADMIN_PAGE_SIZE,
+                                            after, before, ADMIN_POST_PROJECTION)
+
     for post in posts:
-        if post.get('category_id'):
-            category = categories_collection.find_one({'_id': ObjectId(post['category_id'])})
-            post['category_name'] = category['name'] if category else 'Uncategorized'
-    
+        post['category_name'] = category_names.get(post.get('category_id'), 'Uncategorized')
+
+    category_counts = get_post_counts()
+    totals = {'total': 0, 'visible': 0}
+    for row in category_counts.values():
+        totals['total'] += row['total']
+        totals['visible'] += row['visible']
+    totals['hidden'] = totals['total'] - totals['visible']
+
+    for category in categories:
+        counts = category_counts.get(str(category['_id']), {})
+        category['post_count'] = counts.get('total', 0)
+        category['visible_count'] = counts.get('visible', 0)
+
+    filters = {'category': category_filter, 'visibility': visibility_filter, 'q': title_filter}
     return render_template('admin_dashboard.html', 
                          categories=categories, 
-                         posts=posts)
+                         posts=posts,
+                         totals=totals,
+                         filters=filters,
+                         newer=newer,
+                         older=older)
 
 # Category CRUD
 @app.route('/admin/category/create', methods=['POST'])
@@ -644,6 +2083,7 @@ def create_category():
             'visible': visible,
             'created_at': datetime.utcnow()
         })
+        bump_content_version(categories=True)
         flash('Category created successfully', 'success')
     
     return redirect(url_for('admin_dashboard'))
@@ -663,6 +2103,7 @@ def edit_category(category_id):
                 'visible': visible
             }}
         )
+        bump_content_version(categories=True)
         flash('Category updated successfully', 'success')
     
     return redirect(url_for('admin_dashboard'))
@@ -674,6 +2115,7 @@ def delete_category(category_id):
     categories_collection.delete_one({'_id': ObjectId(category_id)})
     # Also delete all posts in this category
     posts_collection.delete_many({'category_id': category_id})
+    bump_content_version(categories=True)
     flash('Category deleted successfully', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -698,11 +2140,13 @@ def create_post():
                 'tagline': tagline,
                 'abstract': generated_abstract,
                 'content': content,
+                'content_html': render_markdown(content),
                 'category_id': category_id,
                 'visible': visible,
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow()
             })
+            bump_content_version()
             flash('Post created successfully', 'success')
             return redirect(url_for('admin_dashboard'))
     
@@ -736,11 +2180,13 @@ def edit_post(post_id):
                     'tagline': tagline,
                     'abstract': generated_abstract,
                     'content': content,
+                    'content_html': render_markdown(content),
                     'category_id': category_id,
                     'visible': visible,
                     'updated_at': datetime.utcnow()
                 }}
             )
+            bump_content_version()
             flash('Post updated successfully', 'success')
             return redirect(url_for('admin_dashboard'))
     
@@ -755,6 +2201,7 @@ def edit_post(post_id):
 def delete_post(post_id):
     """Delete post"""
     posts_collection.delete_one({'_id': ObjectId(post_id)})
+    bump_content_version()
     flash('Post deleted successfully', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -764,29 +2211,56 @@ def delete_post(post_id):
 def preview_markdown():
     """Preview markdown as HTML"""
     content = request.json.get('content', '')
-    html = markdown.markdown(content, extensions=['fenced_code', 'tables'])
+    html = render_markdown(content)
     return jsonify({'html': html})
 
+@app.route('/admin/export')
+@login_required
+def export_content():
+    """Download every category and post as JSONL"""
+    filename = f"blog-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.jsonl"
+    return Response(stream_with_context(iter_export_lines()),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/admin/import', methods=['POST'])
+@login_required
+def import_content_upload():
+    """Import categories and posts from an uploaded JSONL file"""
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('No file selected', 'error')
+        return redirect(url_for('admin_dashboard'))
+
+    counts = import_content(upload.stream)
+    flash(f"Imported {counts['categories']} categories and {counts['posts']} posts "
+          f"({counts['skipped']} skipped)", 'success')
+    return redirect(url_for('admin_dashboard'))
+
 @app.route('/books')
-def books():
-    """Books page showing Literal.club reading lists"""
+@app.route('/books/<int:year>')
+def books(year=None):
+    """Books page showing Literal.club reading lists, with a paginated finished archive"""
+    if year is not None and not valid_archive_year(year):
+        return "Year not found", 404
+
     visible_categories = list(categories_collection.find({'visible': True}).sort('name', 1))
+    page = max(request.args.get('page', 1, type=int), 1)
     
     # Check if we should sync from Literal.club
     if should_sync_books():
         print("Syncing Literal.club data...")
         sync_literal_books()
     
-    # Fetch books from database
-    all_books = list(books_collection.find())
-    
-    # Separate by reading status
-    currently_reading = [b for b in all_books if b.get('reading_status') == 'currently_reading']
-    finished = [b for b in all_books if b.get('reading_status') == 'finished']
-    want_to_read = [b for b in all_books if b.get('reading_status') == 'want_to_read']
+    # The current shelves are short; the finished archive is paged
+    currently_reading = list(books_collection.find({'reading_status': 'currently_reading'}))
+    want_to_read = list(books_collection.find({'reading_status': 'want_to_read'}))
     
-    # Sort finished books by completion date (most recent first)
-    finished.sort(key=lambda x: x.get('completed_date', ''), reverse=True)
+    finished_query = {'reading_status': 'finished'}
+    if year is not None:
+        finished_query['completed_on'] = year_range(year)
+    finished, has_next = fetch_page(books_collection, finished_query, [('completed_on', -1)],
+                                    page, ARCHIVE_PAGE_SIZE)
     
     # Get sync info
     sync_record = books_sync_collection.find_one()
@@ -798,35 +2272,44 @@ def books():
             pass
     
     return render_template('books.html',
-                         error=len(all_books) == 0,
+                         error=books_collection.estimated_document_count() == 0,
                          currently_reading=currently_reading,
                          finished=finished,
                          want_to_read=want_to_read,
+                         years=archive_years(books_collection, {'reading_status': 'finished'}),
+                         year=year,
+                         page=page,
+                         has_next=has_next,
                          categories=visible_categories,
                          last_synced=last_synced,
                          now=datetime.now(),
                          current_page='books')
 
 @app.route('/films')
-def films():
-    """Films page showing Letterboxd activity"""
+@app.route('/films/<int:year>')
+def films(year=None):
+    """Films page showing Letterboxd activity, paginated and archived by year"""
+    if year is not None and not valid_archive_year(year):
+        return "Year not found", 404
+
     visible_categories = list(categories_collection.find({'visible': True}).sort('name', 1))
+    page = max(request.args.get('page', 1, type=int), 1)
     
     # Check if we should sync from Letterboxd
     if should_sync_letterboxd():
         print("Syncing Letterboxd data...")
         sync_letterboxd_rss()
     
-    # Fetch films from database
-    films = list(films_collection.find().sort('synced_at', -1))
-    films.sort(key=lambda x: x.get('watched_date_sortkey', ''), reverse=True)
-    import json
-    films_without_id = [{k: v for k, v in film.items() if k != '_id'} for film in films]
-    print(json.dumps(films_without_id, indent=4, default=str))
-
-    # Separate reviews and watches
-    reviews = [f for f in films if f.get('is_review')]
-    watches = [f for f in films if not f.get('is_review')]
+    # Fetch one page of the diary, optionally limited to a year
+    query = {}
+    if year is not None:
+        query['watched_on'] = year_range(year)
+    films, has_next = fetch_page(films_collection, query, [('watched_on', -1)],
+                                 page, ARCHIVE_PAGE_SIZE)
+    
+    # Totals for the stats summary; the unfiltered total comes from collection metadata
+    total_count = films_collection.count_documents(query) if query else films_collection.estimated_document_count()
+    review_count = films_collection.count_documents({**query, 'is_review': True})
     
     # Get sync info
     sync_record = films_sync_collection.find_one()
@@ -838,15 +2321,29 @@ def films():
             pass
     
     return render_template('films.html',
-                         error=len(films) == 0,
+                         error=films_collection.estimated_document_count() == 0,
                          films=films,
-                         reviews=reviews,
-                         watches=watches,
+                         total_count=total_count,
+                         review_count=review_count,
+                         years=archive_years(films_collection),
+                         year=year,
+                         page=page,
+                         has_next=has_next,
                          categories=visible_categories,
                          last_synced=last_synced,
                          now=datetime.now(),
                          current_page='films')
 
+@app.route('/feed.xml')
+def feed():
+    """RSS feed of the latest posts"""
+    return serve_feed('feed.xml', 'application/rss+xml')
+
+@app.route('/sitemap.xml')
+def sitemap():
+    """Sitemap of all public pages"""
+    return serve_feed('sitemap.xml', 'application/xml')
+
 handler = Mangum(app)
 
 if __name__ == '__main__':
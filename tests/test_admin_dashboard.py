@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from api import index
+
+
+def seed_posts(count, category_id='c1'):
+    # Pairs of posts share a timestamp so paging has to break ties on _id
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        index.posts_collection.insert_one({
+            'title': f'Post {i}',
+            'category_id': category_id,
+            'visible': i % 3 != 0,
+            'created_at': base + timedelta(hours=i // 2)
+        })
+
+
+def walk_older(page_size):
+    titles, after, pages = [], None, 0
+    while True:
+        items, newer, older = index.fetch_keyset_page(index.posts_collection, {}, 'created_at',
+                                                      page_size, after=after)
+        assert (newer is None) == (after is None)
+        titles.extend(item['title'] for item in items)
+        pages += 1
+        if not older:
+            return titles, pages
+        after = older
+
+
+def test_keyset_paging_visits_every_post_once(mongo):
+    seed_posts(11)
+
+    titles, pages = walk_older(4)
+
+    assert pages == 3
+    assert sorted(titles) == sorted(f'Post {i}' for i in range(11))
+    assert len(set(titles)) == 11
+
+
+def test_keyset_paging_back_to_newer(mongo):
+    seed_posts(11)
+    first, _, older = index.fetch_keyset_page(index.posts_collection, {}, 'created_at', 4)
+    second, newer, _ = index.fetch_keyset_page(index.posts_collection, {}, 'created_at', 4, after=older)
+
+    back, back_newer, back_older = index.fetch_keyset_page(index.posts_collection, {}, 'created_at', 4,
+                                                           before=newer)
+
+    assert [p['_id'] for p in back] == [p['_id'] for p in first]
+    assert back_newer is None
+    assert back_older == older
+
+
+def test_invalid_cursor_starts_from_newest(mongo):
+    seed_posts(3)
+
+    items, newer, older = index.fetch_keyset_page(index.posts_collection, {}, 'created_at', 2,
+                                                  after='garbage')
+
+    assert items[0]['title'] == 'Post 2'
+    assert older is not None
+
+
+def test_dashboard_counts_and_pager(client):
+    index.categories_collection.insert_one({'name': 'notes', 'visible': True})
+    category_id = str(index.categories_collection.find_one()['_id'])
+    seed_posts(30, category_id)
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    response = client.get('/admin')
+    html = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert '30 total · 20 visible · 10 hidden' in html
+    assert '30 posts · 20 visible' in html
+    assert 'after=' in html and 'before=' not in html
+
+
+def test_dashboard_counts_are_reused_until_content_changes(client, monkeypatch):
+    seed_posts(4)
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    assert '4 total' in client.get('/admin').get_data(as_text=True)
+
+    aggregate = index.posts_collection.aggregate
+    calls = []
+    monkeypatch.setattr(index.posts_collection, 'aggregate', lambda *a, **k: calls.append(1) or aggregate(*a, **k))
+
+    client.get('/admin')
+    assert calls == []
+
+    index.posts_collection.insert_one({'title': 'new', 'category_id': 'c1', 'visible': True,
+                                       'created_at': datetime(2025, 1, 1)})
+    index.bump_content_version()
+    assert '5 total' in client.get('/admin').get_data(as_text=True)
+    assert calls == [1]
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from api import index
+
+
+@pytest.fixture
+def archives(client, mongo):
+    # Fresh sync records keep the pages from calling Letterboxd/Literal
+    mongo.films_sync.insert_one({'last_synced': datetime.utcnow()})
+    mongo.books_sync.insert_one({'last_synced': datetime.utcnow()})
+    mongo.films.insert_many([
+        {'guid': 'a', 'film_title': 'Alpha Film', 'watched_on': datetime(2023, 3, 1), 'year': 2023, 'is_review': True},
+        {'guid': 'b', 'film_title': 'Beta Film', 'watched_on': datetime(2024, 3, 1), 'year': 2024, 'is_review': False},
+    ])
+    mongo.books.insert_one({'id': '1', 'title': 'Book', 'reading_status': 'finished',
+                            'completed_on': datetime(2024, 2, 1), 'year': 2024})
+    return client
+
+
+@pytest.mark.parametrize('path', ['/films/9999', '/books/9999', '/films/0', '/books/1899'])
+def test_out_of_range_year_is_not_found(archives, path):
+    assert archives.get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/films/2024', '/books/2024', '/films', '/books'])
+def test_archive_pages_render(archives, path):
+    assert archives.get(path).status_code == 200
+
+
+def test_year_filter_limits_films(archives):
+    html = archives.get('/films/2023').get_data(as_text=True)
+
+    assert 'Alpha Film' in html
+    assert 'Beta Film' not in html
@@ -0,0 +1,64 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+from api import index
+
+
+@pytest.fixture
+def feeds(client, monkeypatch):
+    monkeypatch.setattr(index, 'SITE_URL', 'https://blog.example')
+    index._feed_cache.clear()
+    index._content_version['checked_at'] = 0
+    index.posts_collection.insert_one({
+        'title': 'Hello', 'abstract': 'hi', 'visible': True, 'created_at': datetime(2024, 5, 1)
+    })
+    yield client
+    index._feed_cache.clear()
+
+
+def test_links_use_canonical_origin_not_host_header(feeds):
+    response = feeds.get('/feed.xml', headers={'Host': 'evil.example', 'Accept-Encoding': 'identity'})
+
+    body = response.get_data(as_text=True)
+    assert 'https://blog.example/post/' in body
+    assert 'evil.example' not in body
+
+
+def test_feed_unavailable_without_site_url(feeds, monkeypatch):
+    monkeypatch.setattr(index, 'SITE_URL', '')
+
+    assert feeds.get('/sitemap.xml').status_code == 503
+
+
+def test_etag_differs_per_encoding(feeds):
+    plain = feeds.get('/feed.xml', headers={'Accept-Encoding': 'identity'})
+    zipped = feeds.get('/feed.xml', headers={'Accept-Encoding': 'gzip'})
+
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert plain.headers['ETag'] != zipped.headers['ETag']
+
+    # A validator for one encoding does not match the other representation
+    revalidated = feeds.get('/feed.xml', headers={'Accept-Encoding': 'identity',
+                                                  'If-None-Match': zipped.headers['ETag']})
+    assert revalidated.status_code == 200
+    revalidated = feeds.get('/feed.xml', headers={'Accept-Encoding': 'gzip',
+                                                  'If-None-Match': zipped.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_gzip_refused_with_zero_quality(feeds):
+    response = feeds.get('/feed.xml', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data().startswith(b'<?xml')
+
+
+def test_alternate_link_only_when_feed_is_served(client, monkeypatch):
+    monkeypatch.setattr(index, 'SITE_URL', '')
+    assert 'application/rss+xml' not in client.get('/').get_data(as_text=True)
+
+    monkeypatch.setattr(index, 'SITE_URL', 'https://blog.example')
+    assert 'application/rss+xml' in client.get('/').get_data(as_text=True)
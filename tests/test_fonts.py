@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from flask import render_template
+
+from api import index
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    path = tmp_path / 'manifest.json'
+    monkeypatch.setattr(index, 'FONTS_MANIFEST', str(path))
+    monkeypatch.setattr(index, '_font_assets', {'loaded': False, 'manifest': None})
+    return path
+
+
+def render_font_links():
+    with index.app.test_request_context('/'):
+        return render_template('font_links.html')
+
+
+def test_built_fonts_are_inlined_without_a_stylesheet(manifest):
+    manifest.write_text(json.dumps({
+        'faces': [{'family': 'Space Grotesk', 'weight': 400, 'file': 'fonts/space-grotesk-400.abc.woff2'}],
+        'preload': ['fonts/space-grotesk-400.abc.woff2']
+    }))
+
+    html = render_font_links()
+
+    assert '<link rel="preload" href="/static/fonts/space-grotesk-400.abc.woff2"' in html
+    assert "font-family: 'Space Grotesk';" in html
+    assert "src: url('/static/fonts/space-grotesk-400.abc.woff2')" in html
+    assert 'stylesheet' not in html
+
+
+def test_missing_manifest_falls_back_to_google_fonts(manifest):
+    assert 'fonts.googleapis.com' in render_font_links()
+
+
+def write_test_font(path, family):
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((400, 0))
+    pen.closePath()
+    glyph = pen.glyph()
+
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(['.notdef', 'A', 'B'])
+    builder.setupCharacterMap({ord('A'): 'A', ord('B'): 'B'})
+    builder.setupGlyf({'.notdef': glyph, 'A': glyph, 'B': glyph})
+    builder.setupHorizontalMetrics({name: (500, 0) for name in ['.notdef', 'A', 'B']})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({'familyName': family, 'styleName': 'Regular'})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.save(str(path))
+
+
+def test_build_fonts_writes_hashed_woff2_and_manifest(tmp_path, manifest, monkeypatch):
+    pytest.importorskip('fontTools')
+    pytest.importorskip('brotli')
+    source_dir = tmp_path / 'src'
+    output_dir = tmp_path / 'static-fonts'
+    source_dir.mkdir()
+    for family, _weight, filename, _preload in index.FONT_FACES:
+        write_test_font(source_dir / filename, family)
+    monkeypatch.setattr(index, 'FONTS_SOURCE_DIR', str(source_dir))
+    monkeypatch.setattr(index, 'FONTS_OUTPUT_DIR', str(output_dir))
+    monkeypatch.setattr(index, 'FONTS_MANIFEST', str(output_dir / 'manifest.json'))
+    output_dir.mkdir()
+    (output_dir / 'space-grotesk-400.stale.woff2').write_bytes(b'old')
+
+    result = index.app.test_cli_runner().invoke(args=['build-fonts'])
+
+    assert result.exit_code == 0, result.output
+    built = json.loads((output_dir / 'manifest.json').read_text())
+    assert len(built['faces']) == len(index.FONT_FACES)
+    for face in built['faces']:
+        data = (output_dir / face['file'].split('/', 1)[1]).read_bytes()
+        assert data[:4] == b'wOF2'
+    assert not (output_dir / 'space-grotesk-400.stale.woff2').exists()
+    assert "font-display: swap;" in render_font_links()
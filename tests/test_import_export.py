@@ -0,0 +1,145 @@
+import io
+from datetime import datetime
+
+from bson import ObjectId
+
+from api import index
+
+
+def export_lines():
+    return list(index.iter_export_lines())
+
+
+def seed():
+    category_id = index.categories_collection.insert_one({
+        'name': 'notes', 'visible': True, 'created_at': datetime(2024, 1, 1)
+    }).inserted_id
+    for i in range(3):
+        index.posts_collection.insert_one({
+            'title': f'Post {i}',
+            'content': f'# Post {i}',
+            'category_id': str(category_id),
+            'visible': True,
+            'views': i,
+            'created_at': datetime(2024, 1, i + 1)
+        })
+    return category_id
+
+
+def test_reimport_into_same_database_does_not_duplicate(mongo):
+    seed()
+    lines = export_lines()
+    index.posts_collection.update_one({'title': 'Post 0'}, {'$set': {'views': 42}})
+
+    counts = index.import_content(lines)
+
+    assert counts['posts'] == 3
+    assert counts['categories'] == 0
+    assert index.posts_collection.count_documents({}) == 3
+    assert index.categories_collection.count_documents({}) == 1
+    # Live view counts are not rolled back by a restore
+    assert index.posts_collection.find_one({'title': 'Post 0'})['views'] == 42
+
+
+def test_import_into_empty_database_keeps_ids(mongo):
+    category_id = seed()
+    post_ids = sorted(post['_id'] for post in index.posts_collection.find())
+    lines = export_lines()
+    index.posts_collection.delete_many({})
+    index.categories_collection.delete_many({})
+
+    counts = index.import_content(lines)
+
+    assert counts == {'categories': 1, 'posts': 3, 'skipped': 0}
+    assert sorted(post['_id'] for post in index.posts_collection.find()) == post_ids
+    post = index.posts_collection.find_one({'title': 'Post 2'})
+    assert post['category_id'] == str(category_id)
+    assert post['views'] == 2
+    assert 'content_html' not in post
+
+    assert index.render_pending_content(workers=1) == 3
+    assert '<h1' in index.posts_collection.find_one({'title': 'Post 2'})['content_html']
+
+
+def test_reimport_drops_stale_html(mongo):
+    seed()
+    lines = [line.replace('# Post 0', '# Changed') for line in export_lines()]
+    index.posts_collection.update_many({}, {'$set': {'content_html': '<h1>old</h1>'}})
+
+    index.import_content(lines)
+
+    assert 'content_html' not in index.posts_collection.find_one({'title': 'Post 0'})
+
+
+def test_first_view_renders_and_stores_html(client):
+    post_id = index.posts_collection.insert_one({
+        'title': 'Lazy', 'content': '# Lazy', 'visible': True, 'created_at': datetime(2024, 1, 1)
+    }).inserted_id
+
+    assert client.get(f'/post/{post_id}').status_code == 200
+
+    assert '<h1' in index.posts_collection.find_one()['content_html']
+
+
+def test_malformed_records_are_skipped_and_rest_published(mongo):
+    version = index.meta_collection.find_one({'_id': 'content_version'})
+    lines = [
+        b'[1]\n',
+        b'"just a string"\n',
+        b'{"type": "post", "title": "t", "content": 5}\n',
+        b'{"type": "post", "title": ["t"], "content": "c"}\n',
+        b'{"type": "category", "name": {"x": 1}}\n',
+        b'\xff\xfe not utf-8\n',
+        b'{"type": "post", "title": "Good", "content": "ok", "views": "lots", "abstract": 7}\n',
+        b'\n',
+    ]
+
+    counts = index.import_content(lines)
+
+    assert counts == {'categories': 0, 'posts': 1, 'skipped': 6}
+    post = index.posts_collection.find_one()
+    assert post['views'] == 0
+    assert post['abstract'] == 'ok'
+    assert version is None
+    assert index.meta_collection.find_one({'_id': 'content_version'})['version'] == 1
+
+
+def test_broken_upload_still_publishes_what_was_read(mongo):
+    def lines():
+        yield '{"type": "post", "title": "First", "content": "ok"}'
+        raise IOError('connection reset')
+
+    try:
+        index.import_content(lines())
+    except IOError:
+        pass
+
+    assert index.posts_collection.count_documents({}) == 1
+    assert index.meta_collection.find_one({'_id': 'content_version'})['version'] == 1
+
+
+def test_admin_upload_with_bad_lines_does_not_error(client):
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    response = client.post('/admin/import', data={
+        'file': (io.BytesIO(b'[1]\n\xff\n{"type": "post", "title": "t", "content": 5}\n'), 'export.jsonl')
+    })
+
+    assert response.status_code == 302
+    assert index.posts_collection.count_documents({}) == 0
+
+
+def test_import_remaps_category_by_name(mongo):
+    existing_id = index.categories_collection.insert_one({'name': 'notes', 'visible': True}).inserted_id
+    exported_id = str(ObjectId())
+    lines = [
+        '{"type": "category", "_id": "%s", "name": "notes"}' % exported_id,
+        '{"type": "post", "title": "Hello", "content": "hi", "category_id": "%s"}' % exported_id,
+        'not json',
+    ]
+
+    counts = index.import_content(lines)
+
+    assert counts == {'categories': 0, 'posts': 1, 'skipped': 1}
+    assert index.posts_collection.find_one()['category_id'] == str(existing_id)
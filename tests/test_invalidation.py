@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+from api import index
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setitem(index._content_version, 'checked_at', 123.0)
+    monkeypatch.setitem(index._popular_posts, 'refreshed_at', 456.0)
+    monkeypatch.setitem(index._popular_posts, 'posts', [{'_id': ObjectId()}])
+    monkeypatch.setitem(index._feed_cache, 'feed.xml', {})
+    monkeypatch.setattr(index.app.jinja_env, 'fragment_cache', {'chrome': 'html'})
+    monkeypatch.setitem(index._invalidation, 'mode', None)
+    monkeypatch.setitem(index._invalidation, 'heartbeat_at', 0.0)
+
+
+def test_post_write_outside_ranking_evicts_nothing(caches):
+    index.invalidate_caches('posts', ObjectId())
+
+    assert index._popular_posts['refreshed_at'] == 456.0
+    assert index._content_version['checked_at'] == 123.0
+    assert index.app.jinja_env.fragment_cache == {'chrome': 'html'}
+
+
+def test_post_write_in_ranking_rerank(caches):
+    index.invalidate_caches('posts', index._popular_posts['posts'][0]['_id'])
+
+    assert index._popular_posts['refreshed_at'] == 0.0
+    assert index._feed_cache
+
+
+def test_meta_write_rereads_version_only(caches):
+    index.invalidate_caches('meta', 'content_version')
+
+    assert index._content_version['checked_at'] == 0.0
+    assert not index._feed_cache
+    assert index._popular_posts['refreshed_at'] == 456.0
+    assert index.app.jinja_env.fragment_cache == {'chrome': 'html'}
+
+
+def test_category_write_clears_fragments(caches):
+    index.invalidate_caches('categories', ObjectId())
+
+    assert index.app.jinja_env.fragment_cache == {}
+    assert index._content_version['checked_at'] == 123.0
+
+
+def test_long_ttl_needs_a_fresh_heartbeat(caches, mongo, monkeypatch):
+    mongo.meta.insert_one({'_id': 'content_version', 'version': 1})
+    checked_at = time.time() - index.CONTENT_VERSION_TTL - 1
+    monkeypatch.setitem(index._content_version, 'version', 0)
+    monkeypatch.setitem(index._invalidation, 'mode', 'change_stream')
+
+    monkeypatch.setitem(index._invalidation, 'heartbeat_at', time.time())
+    monkeypatch.setitem(index._content_version, 'checked_at', checked_at)
+    assert index.get_content_version()[0] == 0
+
+    # A frozen instance thaws with a stale heartbeat and falls back to the short TTL
+    monkeypatch.setitem(index._invalidation, 'heartbeat_at', time.time() - index.CHANGE_STREAM_HEARTBEAT_TIMEOUT)
+    assert index.get_content_version()[0] == 1
+
+
+REPLSET_URI = os.getenv('MONGO_REPLSET_URI')
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.skipif(not REPLSET_URI, reason='set MONGO_REPLSET_URI to a replica set, e.g. a local single-node one')
+def test_change_stream_invalidates_across_instances(caches, monkeypatch):
+    db = MongoClient(REPLSET_URI)['blog_invalidation_test']
+    db.client.drop_database(db.name)
+    monkeypatch.setattr(index, 'db', db)
+    monkeypatch.setattr(index, 'CHANGE_STREAM_AWAIT_MS', 200)
+    ranked = index._popular_posts['posts'][0]['_id']
+    db.posts.insert_many([{'_id': ranked, 'views': 1}, {'_id': ObjectId(), 'title': 'other'}])
+
+    threading.Thread(target=index.watch_changes, daemon=True).start()
+    assert wait_for(lambda: index._invalidation['mode'] == 'change_stream')
+    assert wait_for(index.change_stream_live)
+    index._content_version['checked_at'] = 123.0
+    index._popular_posts['refreshed_at'] = 456.0
+
+    # View counter flushes are filtered out
+    db.posts.update_one({'_id': ranked}, {'$inc': {'views': 1}})
+    db.meta.update_one({'_id': 'content_version'}, {'$inc': {'version': 1}}, upsert=True)
+    assert wait_for(lambda: index._content_version['checked_at'] == 0.0)
+    assert index._popular_posts['refreshed_at'] == 456.0
+
+    db.posts.update_one({'_id': ranked}, {'$set': {'title': 'renamed'}})
+    assert wait_for(lambda: index._popular_posts['refreshed_at'] == 0.0)
+
+    db.categories.insert_one({'name': 'new'})
+    assert wait_for(lambda: index.app.jinja_env.fragment_cache == {})
+    db.client.drop_database(db.name)
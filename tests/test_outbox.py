@@ -0,0 +1,144 @@
+import socket
+from datetime import datetime
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+from api import index
+
+
+class RecordingHandler(Sink):
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch, mongo):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    monkeypatch.setattr(index, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(index, 'SMTP_PORT', controller.port)
+    monkeypatch.setattr(index, 'SMTP_EMAIL', 'blog@example.com')
+    monkeypatch.setattr(index, 'SMTP_PASSWORD', None)
+    monkeypatch.setattr(index, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(index, 'ADMIN_EMAIL', 'admin@example.com')
+    # Only the request drain delivers mail in these tests
+    monkeypatch.setattr(index, 'start_outbox_worker', lambda: None)
+    yield handler
+    index.close_smtp_connection()
+    controller.stop()
+
+
+def test_process_outbox_delivers_and_records_latency(smtp_sink):
+    index.enqueue_email('admin@example.com', 'Subject', 'body')
+
+    assert index.process_outbox() == 1
+
+    assert len(smtp_sink.messages) == 1
+    assert smtp_sink.messages[0].rcpt_tos == ['admin@example.com']
+    message = index.mail_outbox_collection.find_one()
+    assert message['status'] == 'sent'
+    assert message['latency_ms'] >= 0
+
+
+def test_process_outbox_reuses_connection(smtp_sink):
+    for i in range(3):
+        index.enqueue_email('admin@example.com', f'Subject {i}', 'body')
+
+    assert index.process_outbox() == 3
+
+    assert len(smtp_sink.messages) == 3
+    assert len(smtp_sink.sessions) == 1
+
+
+def test_process_outbox_respects_limit(smtp_sink):
+    for i in range(3):
+        index.enqueue_email('admin@example.com', f'Subject {i}', 'body')
+
+    assert index.process_outbox(limit=2) == 2
+    assert index.mail_outbox_collection.count_documents({'status': 'pending'}) == 1
+
+
+def test_failed_delivery_backs_off(smtp_sink, monkeypatch):
+    monkeypatch.setattr(index, 'SMTP_PORT', free_port())
+    index.enqueue_email('admin@example.com', 'Subject', 'body')
+
+    assert index.process_outbox() == 0
+
+    message = index.mail_outbox_collection.find_one()
+    assert message['status'] == 'pending'
+    assert message['attempts'] == 1
+    assert message['next_attempt_at'] > datetime.utcnow()
+    assert not smtp_sink.messages
+
+
+def login(client, monkeypatch):
+    monkeypatch.setattr(index, 'ADMIN_PASSWORD', 'secret')
+    return client.post('/admin/login', data={'password': 'secret'})
+
+
+def test_admin_login_queues_otp_without_waiting_on_smtp(smtp_sink, client, monkeypatch):
+    response = login(client, monkeypatch)
+    response.close()
+
+    assert response.status_code == 302
+    assert not smtp_sink.messages
+    assert index.mail_outbox_collection.find_one()['status'] == 'pending'
+    assert 'otp-status' in client.get('/admin/verify-otp').get_data(as_text=True)
+
+
+def test_otp_status_delivers_the_otp(smtp_sink, client, monkeypatch):
+    login(client, monkeypatch)
+
+    assert client.get('/admin/otp-status').get_json() == {'status': 'sent', 'error': None}
+
+    assert len(smtp_sink.messages) == 1
+    otp = index.otps_collection.find_one()['otp']
+    assert otp in smtp_sink.messages[0].content.decode()
+
+
+def test_otp_status_reports_delivery_failure(smtp_sink, client, monkeypatch):
+    monkeypatch.setattr(index, 'SMTP_PORT', free_port())
+    monkeypatch.setattr(index, 'OUTBOX_MAX_ATTEMPTS', 1)
+    login(client, monkeypatch)
+
+    result = client.get('/admin/otp-status').get_json()
+
+    assert result['status'] == 'failed'
+    assert result['error']
+
+
+def test_login_reports_missing_smtp_settings(smtp_sink, client, monkeypatch):
+    monkeypatch.setattr(index, 'SMTP_SERVER', None)
+
+    response = login(client, monkeypatch)
+
+    assert response.status_code == 200
+    assert 'Error sending OTP' in response.get_data(as_text=True)
+    assert index.mail_outbox_collection.count_documents({}) == 0
+
+
+def test_cron_drain_requires_secret(smtp_sink, client, monkeypatch):
+    index.enqueue_email('admin@example.com', 'Subject', 'body')
+    assert client.post('/tasks/outbox').status_code == 404
+
+    monkeypatch.setattr(index, 'CRON_SECRET', 'token')
+    assert client.post('/tasks/outbox', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.post('/tasks/outbox', headers={'Authorization': 'Bearer token'})
+    assert response.get_json() == {'sent': 1}
+    assert len(smtp_sink.messages) == 1
@@ -0,0 +1,89 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+from api import index
+
+
+def fresh_env(module, bytecode_cache):
+    env = module.app.create_jinja_environment()
+    env.globals.update(module.app.jinja_env.globals)
+    env.bytecode_cache = bytecode_cache
+    return env
+
+
+def compile_into(module, directory):
+    env = fresh_env(module, module.ShippedBytecodeCache(str(directory), str(directory)))
+    for name in env.list_templates():
+        env.get_template(name)
+
+
+def render_post(env):
+    post = {'_id': 'x', 'title': 'T', 'content_html': '<p>hi</p>', 'created_at': index.datetime(2024, 1, 1)}
+    with index.app.test_request_context('/'):
+        return env.get_template('post.html').render(post=post, categories=[], categories_version=lambda: 1)
+
+
+@pytest.fixture
+def index_as_other_module():
+    # The same file imported under another name, as 'FLASK_APP=api/index.py' does
+    spec = importlib.util.spec_from_file_location('index', index.__file__)
+    module = importlib.util.module_from_spec(spec)
+    saved = sys.modules.get('index')
+    sys.modules['index'] = module
+    try:
+        spec.loader.exec_module(module)
+        yield module
+    finally:
+        if saved is None:
+            sys.modules.pop('index', None)
+        else:
+            sys.modules['index'] = saved
+
+
+def test_precompiled_bundle_is_used_without_scratch_writes(tmp_path):
+    shipped, scratch = tmp_path / 'shipped', tmp_path / 'scratch'
+    compile_into(index, shipped)
+
+    fresh_env(index, index.ShippedBytecodeCache(str(shipped), str(scratch))).get_template('blog.html')
+
+    assert not scratch.exists()
+
+
+def test_bundle_compiled_under_another_module_name_renders(tmp_path, index_as_other_module):
+    shipped, scratch = tmp_path / 'shipped', tmp_path / 'scratch'
+    compile_into(index_as_other_module, shipped)
+
+    html = render_post(fresh_env(index, index.ShippedBytecodeCache(str(shipped), str(scratch))))
+
+    assert '<p>hi</p>' in html
+    assert not scratch.exists()
+
+
+def test_bytecode_is_not_shared_across_extension_sets(tmp_path):
+    shipped, scratch = tmp_path / 'shipped', tmp_path / 'scratch'
+    compile_into(index, shipped)
+    env = fresh_env(index, index.ShippedBytecodeCache(str(shipped), str(scratch)))
+    env.add_extension('jinja2.ext.debug')
+
+    assert '<p>hi</p>' in render_post(env)
+    assert os.listdir(scratch)
+
+
+def test_missing_bundle_falls_back_to_scratch_dir(tmp_path):
+    scratch = tmp_path / 'scratch'
+
+    fresh_env(index, index.ShippedBytecodeCache(str(tmp_path / 'missing'), str(scratch))).get_template('blog.html')
+
+    assert len(os.listdir(scratch)) == 1
+
+
+def test_unwritable_cache_does_not_break_rendering(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+
+    env = fresh_env(index, index.ShippedBytecodeCache(str(tmp_path / 'missing'), str(blocker / 'cache')))
+
+    assert env.get_template('font_links.html') is not None
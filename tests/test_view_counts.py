@@ -0,0 +1,50 @@
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from api import index
+
+
+class FailingPosts:
+    def __init__(self, error):
+        self.error = error
+
+    def bulk_write(self, requests, ordered=True):
+        raise self.error
+
+
+def buffer_views(monkeypatch, counts):
+    monkeypatch.setattr(index, '_view_counts', dict(counts))
+    monkeypatch.setattr(index, '_view_events', sum(counts.values()))
+
+
+def test_flush_increments_views(mongo, monkeypatch):
+    post_id = mongo.posts.insert_one({'title': 'a', 'views': 2}).inserted_id
+    buffer_views(monkeypatch, {str(post_id): 3})
+
+    assert index.flush_view_counts() == 1
+
+    assert mongo.posts.find_one()['views'] == 5
+    assert index._view_counts == {}
+
+
+def test_partial_bulk_failure_retries_only_failed_updates(monkeypatch):
+    ids = [str(ObjectId()) for _ in range(3)]
+    buffer_views(monkeypatch, {ids[0]: 1, ids[1]: 2, ids[2]: 3})
+    error = BulkWriteError({'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'boom'}], 'nModified': 2})
+    monkeypatch.setattr(index, 'posts_collection', FailingPosts(error))
+
+    assert index.flush_view_counts() == 2
+
+    assert index._view_counts == {ids[1]: 2}
+    assert index._view_events == 2
+
+
+def test_failed_flush_keeps_every_count(monkeypatch):
+    ids = [str(ObjectId()) for _ in range(2)]
+    buffer_views(monkeypatch, {ids[0]: 1, ids[1]: 4})
+    monkeypatch.setattr(index, 'posts_collection', FailingPosts(AutoReconnect('down')))
+
+    assert index.flush_view_counts() == 0
+
+    assert index._view_counts == {ids[0]: 1, ids[1]: 4}
+    assert index._view_events == 5